@@ -0,0 +1,59 @@
+"""
+Micro-benchmark: decoding stored analysis results for the My Videos list
+
+Compares the old path (results saved as str(dict), read back one row at a time
+with eval()) against AnalysisRecord.from_dict() + analysis_frame().
+
+Usage: python benchmarks/bench_analysis_decode.py [rows]
+"""
+import sys
+import json
+
+from common import import_app, best_time
+
+import_app()
+from streamlit_app import AnalysisRecord, analysis_frame, parse_gradio_results  # noqa: E402
+
+SAMPLE_OUTPUT = """
+**Classification:** NORMAL
+**Confidence:** 86%
+**Processing Time:** 2.37s
+**Details:** Consistent stride pattern
+
+**Metrics:**
+- Stride Variability: 0.589
+- Mean Knee Angle: 66.0°
+- Body Length Variation: 0.749
+"""
+
+def bench(label, fn, rows):
+    best = best_time(fn)
+    print(f"{label:<32} {best * 1e6 / rows:8.2f} µs/row  ({best * 1e3:.1f} ms total)")
+    return best
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    results = parse_gradio_results(SAMPLE_OUTPUT)
+
+    # Old storage: {"raw": str(dict)} in JSONB, returned as a JSON string per video
+    legacy_rows = [{'analysis_results': {'raw': str(results)}} for _ in range(rows)]
+    # New storage: native JSONB, the list query only returns the summary fields
+    native_rows = [AnalysisRecord.from_dict(results).to_dict() for _ in range(rows)]
+
+    def legacy():
+        decoded = []
+        for row in legacy_rows:
+            text = json.dumps(row['analysis_results'])
+            decoded.append(eval(json.loads(text)['raw']))
+        return decoded
+
+    def typed():
+        return analysis_frame([AnalysisRecord.from_dict(row) for row in native_rows])
+
+    print(f"Decoding {rows} analysis results")
+    old = bench("str()/eval() per row", legacy, rows)
+    new = bench("AnalysisRecord + analysis_frame", typed, rows)
+    print(f"Speedup: {old / new:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Benchmark: whole-app reruns against local Supabase and Gradio stand-ins
+
+Drives the real main() through streamlit.testing's AppTest, with the
+Supabase clients and the Gradio Client replaced by the fakes in fakes.py
+(configurable latency and dataset size). For each step of each scenario it
+reports the rerun's wall time, the backend calls it made, and each
+scenario's peak Python memory.
+
+Steps that change a widget inside a tab's fragment rerun only that fragment,
+as the browser does. Steps "after N min" first move the clock on by N
+minutes, so reads cached for less than that are fetched again.
+
+Results are saved to benchmarks/results/<commit>.json and compared with the
+newest earlier result (or --baseline): steps that got slower by more than
+--tolerance, or that make more backend calls, are reported as regressions
+and the exit status is 1.
+
+Scenarios:
+  user_1k_videos   a rider with --videos videos browsing My Videos
+  admin_10k_users  an admin with --users users on the dashboard and User Management
+  batch_analysis   a rider analyzing a batch of --batch clips
+
+Usage: python benchmarks/bench_app.py [scenario ...] [--latency S] [--gradio-latency S]
+       [--videos N] [--users N] [--batch N] [--repeat N] [--baseline COMMIT] [--no-save]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+import dataclasses
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from unittest import mock
+
+from common import REPO_ROOT, quiet_streamlit
+from fakes import FakeBackend, install
+
+APP_PATH = os.path.join(REPO_ROOT, 'streamlit_app.py')
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+CLIP_BYTES = 256 * 1024
+BATCH_TIMEOUT = 120
+# Slowdowns smaller than this are noise, whatever the percentage
+MIN_REGRESSION_SECONDS = 0.02
+
+SCENARIOS = {}
+
+def scenario(func):
+    SCENARIOS[func.__name__] = func
+    return func
+
+class Run:
+    """One scenario run: an AppTest session plus the backend it talks to"""
+
+    def __init__(self, backend):
+        from streamlit.testing.v1 import AppTest
+
+        install(backend)
+        self.backend = backend
+        self.at = AppTest.from_file(APP_PATH, default_timeout=BATCH_TIMEOUT)
+        self.steps = []
+        self.clock_offset = 0
+
+    def step(self, name, action, fragment=None, idle_minutes=0):
+        """Time action() (which reruns the app) and record the backend calls it made
+
+        fragment: key of the fragment whose widget action() changes.
+        idle_minutes: how long the user waits before the step.
+        """
+        self.backend.reset_calls()
+        self.clock_offset += idle_minutes * 60
+        real_time = time.time
+        with mock.patch('time.time', lambda: real_time() + self.clock_offset):
+            with self.scoped_to(fragment) as scoped:
+                started = time.perf_counter()
+                action()
+                seconds = time.perf_counter() - started
+            if self.at.exception:
+                raise RuntimeError(f"{name}: {self.at.exception[0].value}")
+            calls = self.backend.reset_calls()
+            self.steps.append({'step': name, 'seconds': seconds, 'calls': sum(calls.values()), 'by_call': calls})
+
+            # AppTest only keeps what the fragment rerun drew - an untimed full
+            # rerun brings back the widgets outside it for the next steps
+            if scoped:
+                self.at.run()
+                self.backend.reset_calls()
+
+    @contextlib.contextmanager
+    def scoped_to(self, fragment):
+        """Reruns requested inside the block run only the fragment with this key; yields whether they do"""
+        from streamlit.errors import StreamlitAPIException
+        from streamlit.runtime.scriptrunner_utils.script_requests import ScriptRequests
+        from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+        try:
+            fragment_ids = self.at._fragment_storage.resolve_target(fragment) if fragment else None
+        except StreamlitAPIException:
+            # Commits from before the tabs were fragments rerun the whole app
+            fragment_ids = None
+        if not fragment_ids:
+            yield False
+            return
+
+        request_rerun = LocalScriptRunner.request_rerun
+        def fragment_rerun(runner, rerun_data):
+            # Drop the full rerun a new runner starts with queued, or it would absorb this one
+            runner._requests = ScriptRequests()
+            return request_rerun(runner, dataclasses.replace(rerun_data, fragment_id_queue=list(fragment_ids)))
+        with mock.patch.object(LocalScriptRunner, 'request_rerun', fragment_rerun):
+            yield True
+
+    def log_in(self):
+        self.at.run()
+        self.step("login page", self.at.run)
+        self.at.text_input(key='login_email').input('rider@example.com')
+        self.at.text_input(key='login_password').input('password')
+        self.step("log in", self.at.button(key='FormSubmitter:login_form-Login').click().run)
+        self.step("rerun", self.at.run)
+
+@scenario
+def user_1k_videos(args):
+    backend = FakeBackend(args.latency, args.gradio_latency)
+    backend.log_in_as(backend.add_user('rider', videos=args.videos))
+    run = Run(backend)
+    run.log_in()
+    run.step("older page", run.at.button(key='videos_older').click().run, 'my_videos')
+    run.step("trends view", run.at.radio(key='videos_view').set_value('Trends').run, 'my_videos')
+    run.step("list view", run.at.radio(key='videos_view').set_value('List').run, 'my_videos')
+    run.step("batch mode after 10 min", run.at.radio(key='analysis_mode').set_value('Batch').run,
+             'video_analysis', idle_minutes=10)
+    return run
+
+@scenario
+def admin_10k_users(args):
+    backend = FakeBackend(args.latency, args.gradio_latency)
+    backend.log_in_as(backend.add_user('admin', is_admin=True, videos=20))
+    for i in range(args.users - 1):
+        backend.add_user(f'rider{i}', videos=i % 3)
+    run = Run(backend)
+    run.log_in()
+    run.step("next users page", run.at.button(key='users_next').click().run, 'user_management')
+    run.step("search users", run.at.text_input(key='user_search').input('rider12').run, 'user_management')
+    run.step("upload trends window", run.at.radio(key='upload_trend_days').set_value(90).run, 'admin_dashboard')
+    run.step("my trends after 2 min", run.at.radio(key='videos_view').set_value('Trends').run,
+             'my_videos', idle_minutes=2)
+    return run
+
+@scenario
+def batch_analysis(args):
+    backend = FakeBackend(args.latency, args.gradio_latency)
+    backend.log_in_as(backend.add_user('rider', videos=10))
+    run = Run(backend)
+    run.log_in()
+    run.step("batch mode", run.at.radio(key='analysis_mode').set_value('Batch').run, 'video_analysis')
+    clips = [(f'clip-{i}.mp4', os.urandom(CLIP_BYTES), 'video/mp4') for i in range(args.batch)]
+    run.step("upload clips", run.at.file_uploader(key='batch_uploader').set_value(clips).run, 'video_analysis')
+    submit = next(button for button in run.at.button if button.label == f"Analyze {args.batch} Videos")
+
+    # One step: the workers' calls would otherwise land in whichever step is running
+    def submit_and_wait():
+        submit.click().run()
+        deadline = time.monotonic() + BATCH_TIMEOUT
+        while 'analysis_batch_outcome' not in run.at.session_state:
+            if time.monotonic() > deadline:
+                raise RuntimeError("batch did not finish")
+            time.sleep(0.05)
+            run.at.run()
+    run.step("submit until saved", submit_and_wait)
+    return run
+
+def run_scenario(name, args):
+    """Best time per step over args.repeat runs, then one traced run for peak memory"""
+    import streamlit as st
+
+    best = None
+    for _ in range(args.repeat):
+        # Every run starts cold, as after a deploy
+        st.cache_resource.clear()
+        steps = SCENARIOS[name](args).steps
+        if best is None:
+            best = steps
+        else:
+            for kept, step in zip(best, steps):
+                kept['seconds'] = min(kept['seconds'], step['seconds'])
+
+    peak = None
+    if args.memory:
+        st.cache_resource.clear()
+        tracemalloc.start()
+        SCENARIOS[name](args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {'steps': best, 'peak_memory_mb': None if peak is None else peak / 1e6}
+
+def git_commit():
+    """Short HEAD commit, with -dirty if tracked files have uncommitted changes"""
+    def git(*command):
+        return subprocess.run(['git', *command], cwd=REPO_ROOT, capture_output=True, text=True)
+    head = git('rev-parse', '--short', 'HEAD').stdout.strip() or 'unknown'
+    return head + ('-dirty' if git('diff', '--quiet', 'HEAD').returncode else '')
+
+def load_baseline(commit, current):
+    """The results for commit, or the newest saved results other than current's"""
+    if commit:
+        path = os.path.join(RESULTS_DIR, f'{commit}.json')
+        if not os.path.exists(path):
+            sys.exit(f"No saved results for {commit} in {RESULTS_DIR}")
+        with open(path) as f:
+            return json.load(f)
+
+    saved = []
+    for name in os.listdir(RESULTS_DIR) if os.path.isdir(RESULTS_DIR) else []:
+        if name.endswith('.json') and name != f'{current}.json':
+            with open(os.path.join(RESULTS_DIR, name)) as f:
+                saved.append(json.load(f))
+    return max(saved, key=lambda results: results['recorded_at'], default=None)
+
+def report(results, baseline, tolerance):
+    """Print every step next to the baseline; returns the number of regressions"""
+    regressions = 0
+    base_scenarios = baseline['scenarios'] if baseline else {}
+    if baseline:
+        print(f"Compared with {baseline['commit']} ({baseline['recorded_at']})")
+    print(f"{'scenario / step':<40} {'seconds':>8} {'change':>8} {'calls':>6} {'change':>7}")
+
+    for name, scenario_results in results['scenarios'].items():
+        base_steps = {step['step']: step for step in base_scenarios.get(name, {}).get('steps', [])}
+        memory = scenario_results['peak_memory_mb']
+        print(f"{name}" + (f"  (peak memory {memory:.1f} MB)" if memory is not None else ""))
+        for step in scenario_results['steps']:
+            base = base_steps.get(step['step'])
+            line = f"  {step['step']:<38} {step['seconds']:8.3f}"
+            flag = ""
+            if base:
+                line += f" {(step['seconds'] / base['seconds'] - 1) * 100 if base['seconds'] else 0:+7.0f}%"
+                line += f" {step['calls']:6} {step['calls'] - base['calls']:+7}"
+                slower = (step['seconds'] > base['seconds'] * (1 + tolerance)
+                          and step['seconds'] - base['seconds'] > MIN_REGRESSION_SECONDS)
+                if slower or step['calls'] > base['calls']:
+                    regressions += 1
+                    flag = "  << regression"
+            else:
+                line += f" {'':>8} {step['calls']:6}"
+            print(line + flag)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip(),
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scenarios', nargs='*', help=f"scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument('--latency', type=float, default=0.005, help="seconds per Supabase request")
+    parser.add_argument('--gradio-latency', type=float, default=0.2, help="seconds per Gradio prediction")
+    parser.add_argument('--videos', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--batch', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown before a step is flagged")
+    parser.add_argument('--baseline', help="commit to compare with (default: newest saved results)")
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help="skip the traced memory run")
+    parser.add_argument('--no-save', dest='save', action='store_false')
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    quiet_streamlit()
+    # Keep the app's metrics and profiles out of the real ones
+    os.environ['METRICS_DB_PATH'] = os.path.join(tempfile.mkdtemp(prefix='tru-stride-bench-'), 'metrics.sqlite3')
+    os.environ.pop('PROFILE_RERUNS', None)
+
+    commit = git_commit()
+    results = {
+        'commit': commit,
+        'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'settings': {key: getattr(args, key) for key in ('latency', 'gradio_latency', 'videos', 'users', 'batch', 'repeat')},
+        'scenarios': {}
+    }
+    for name in args.scenarios or SCENARIOS:
+        print(f"Running {name}...", file=sys.stderr)
+        results['scenarios'][name] = run_scenario(name, args)
+
+    baseline = load_baseline(args.baseline, commit)
+    if baseline and baseline['settings'] != results['settings']:
+        print(f"Note: {baseline['commit']} was recorded with different settings: {baseline['settings']}")
+    regressions = report(results, baseline, args.tolerance)
+
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        with open(os.path.join(RESULTS_DIR, f'{commit}.json'), 'w') as f:
+            json.dump(results, f, indent=2)
+    if regressions:
+        print(f"{regressions} regressions")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Benchmark: cold start to the login sidebar
+
+Starts fresh Python processes (like a new Streamlit worker or a Streamlit
+Cloud wake-up) and times the app's first run up to the rendered login
+sidebar, with Streamlit itself already imported. Also lists the slowest
+imports of that first run (from -X importtime) and which heavy modules it
+loaded.
+
+Exits non-zero when the best time is over --budget or any of HEAVY_MODULES
+is imported before someone has logged in.
+
+Usage: python benchmarks/bench_cold_start.py [--runs N] [--budget SECONDS]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+from common import REPO_ROOT
+
+APP_PATH = os.path.join(REPO_ROOT, 'streamlit_app.py')
+# Only needed once a tab renders data, or when a user logs in / analyzes
+HEAVY_MODULES = ['pandas', 'plotly.express', 'plotly.graph_objects', 'supabase', 'gradio_client']
+MARKER = 'bench-cold-start: first run'
+
+def child():
+    """Runs in the fresh process: time the first run, report as JSON on stdout"""
+    import time
+    import logging
+    from streamlit.testing.v1 import AppTest
+
+    logging.disable(logging.WARNING)
+    os.environ.setdefault('SUPABASE_URL', 'http://fake-supabase')
+    os.environ.setdefault('SUPABASE_ANON_KEY', 'anon-key')
+    already_loaded = set(sys.modules)
+
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    print(MARKER, file=sys.stderr, flush=True)
+    started = time.perf_counter()
+    at.run()
+    seconds = time.perf_counter() - started
+
+    rendered = any(element.label == "Email" for element in at.sidebar.text_input)
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules and name not in already_loaded]
+    print(json.dumps({'seconds': seconds, 'login_rendered': rendered, 'heavy_modules': loaded}))
+
+def slowest_imports(importtime_log, top):
+    """Top-level imports after MARKER by cumulative time, from -X importtime output"""
+    imports = []
+    after_marker = False
+    for line in importtime_log.splitlines():
+        if MARKER in line:
+            after_marker = True
+        elif after_marker and line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            # Nested imports are indented; their time is included in their parent's
+            if not name.startswith('  '):
+                imports.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--runs', type=int, default=5, help="fresh processes to start")
+    parser.add_argument('--budget', type=float, default=1.0, help="seconds allowed to the login sidebar")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return 0
+
+    results = []
+    for run in range(args.runs):
+        # The last run also logs import times
+        flags = ['-X', 'importtime'] if run == args.runs - 1 else []
+        process = subprocess.run([sys.executable, *flags, os.path.abspath(__file__), '--child'],
+                                 capture_output=True, text=True, cwd=REPO_ROOT)
+        if process.returncode:
+            print(process.stderr[-2000:])
+            return 1
+        results.append(json.loads(process.stdout.strip().splitlines()[-1]))
+
+    times = sorted(result['seconds'] for result in results[:-1] or results)
+    best, median = times[0], times[len(times) // 2]
+    print(f"First run to login sidebar: best {best:.3f}s, median {median:.3f}s over {len(times)} fresh processes")
+
+    print("Slowest imports during the first run:")
+    for seconds, name in slowest_imports(process.stderr, 8):
+        print(f"  {seconds:6.3f}s  {name}")
+
+    failures = []
+    if not all(result['login_rendered'] for result in results):
+        failures.append("login sidebar was not rendered")
+    if best > args.budget:
+        failures.append(f"{best:.3f}s is over the {args.budget:.1f}s budget")
+    heavy = sorted({name for result in results for name in result['heavy_modules']})
+    if heavy:
+        failures.append(f"imported before login: {', '.join(heavy)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
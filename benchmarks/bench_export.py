@@ -0,0 +1,103 @@
+"""
+Benchmark: streaming export of the videos table
+
+Exports a synthetic table of N videos (100k by default) as CSV and Parquet
+through export_analysis_history() and reports time, file size and peak
+Python memory. The stub database builds each page on request, so the write
+peak reflects what the export itself holds - it should stay at about one page
+of rows, not grow with N. The download peak is read_export(), which hands the
+finished file to st.download_button: it holds the whole file, so it grows
+with N.
+
+Usage: python benchmarks/bench_export.py [rows]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+from common import import_app
+
+import_app()
+from streamlit_app import available_export_formats, export_analysis_history, read_export  # noqa: E402
+
+RESULTS = {
+    'primary_gait': 'Stride: NORMAL', 'classification': 'NORMAL', 'confidence': 0.86,
+    'stride_length': 2.2, 'rhythm_score': 4.1, 'symmetry_score': 2.5, 'stride_variability': 0.589,
+    'knee_angle': 66.0, 'body_length_variation': 0.749, 'processing_time': 2.37,
+    'details': 'Consistent stride pattern',
+}
+
+class StubQuery:
+    """Just enough of a PostgREST query for iter_video_pages() and the username lookup"""
+    def __init__(self, table, rows):
+        self.table, self.rows = table, rows
+        self.after, self.page_size, self.ids = 0, None, []
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        return self
+
+    def in_(self, column, values):
+        self.ids = values
+        return self
+
+    def gt(self, column, value):
+        self.after = value
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, page_size):
+        self.page_size = page_size
+        return self
+
+    def execute(self):
+        if self.table == 'profiles':
+            self.data = [{'id': user_id, 'username': f'rider{user_id[5:]}'} for user_id in self.ids]
+            return self
+        end = min(self.after + self.page_size, self.rows)
+        self.data = [{
+            'id': video_id, 'user_id': f'user-{video_id % 50}', 'filename': f'clip-{video_id}.mp4',
+            'upload_date': '2026-01-01T12:00:00', 'file_path': f'user-{video_id % 50}/clip-{video_id}.mp4',
+            **RESULTS
+        } for video_id in range(self.after + 1, end + 1)]
+        return self
+
+class StubSupabase:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def table(self, name):
+        return StubQuery(name, self.rows)
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    supabase = StubSupabase(rows)
+
+    print(f"Exporting {rows:,} videos")
+    print(f"{'format':<8} {'write':>8}  {'file':>10}  {'write peak':>12}  {'download peak':>15}")
+    for file_format in available_export_formats():
+        started = time.perf_counter()
+        path = export_analysis_history(supabase, file_format)
+        elapsed = time.perf_counter() - started
+        size = os.path.getsize(path)
+        os.unlink(path)
+
+        # Again with tracing, which slows it down too much to time
+        tracemalloc.start()
+        path = export_analysis_history(supabase, file_format)
+        write_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        data = read_export(path)
+        download_peak = tracemalloc.get_traced_memory()[1]
+        del data
+        tracemalloc.stop()
+        print(f"{file_format:<8} {elapsed:6.2f} s  {size / 1e6:7.1f} MB  {write_peak / 1e6:9.1f} MB  "
+              f"{download_peak / 1e6:12.1f} MB")
+
+if __name__ == "__main__":
+    main()
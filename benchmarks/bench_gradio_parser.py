@@ -0,0 +1,142 @@
+"""
+Benchmark and fuzz check for the Gradio output parser
+
+Parses the recorded outputs in corpus/gradio/ plus mutated copies of them
+(CRLF line endings, indentation, label case, bullet style, shuffled and
+dropped lines, noise lines, values replaced by N/A) and reports parse
+throughput and, for each field, how often it was missed, misread or found
+where there was none.
+
+Each recorded output has hand-labelled fields in <name>.expected.json: the
+value and, for markdown, the line it is on. A mutated output is expected to
+yield the labelled fields whose lines survived the mutation with their value.
+
+Usage: python benchmarks/bench_gradio_parser.py [mutations per output] [seed]
+"""
+import os
+import sys
+import re
+import json
+import math
+import random
+from collections import Counter
+from contextlib import redirect_stdout
+
+from common import import_app, best_time
+
+import_app()
+from streamlit_app import GRADIO_FIELDS, extract_gradio_fields, parse_gradio_results  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus', 'gradio')
+
+NUMBER_PATTERN = re.compile(r'\d+(?:\.\d+)?')
+NOISE_LINES = [
+    "Frames analysed: 240",
+    "Note - video was trimmed to the first 10 seconds",
+    "---",
+    "🐴 Horse detected with high confidence",
+]
+
+def load_corpus():
+    """{name: (text, labels)} where labels are {field: {'value': ..., 'line': index}}"""
+    corpus = {}
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if name.endswith('.expected.json'):
+            continue
+        with open(os.path.join(CORPUS_DIR, name), encoding='utf-8', newline='') as f:
+            text = f.read()
+        with open(os.path.join(CORPUS_DIR, f"{os.path.splitext(name)[0]}.expected.json"), encoding='utf-8') as f:
+            corpus[name] = (text, json.load(f))
+    return corpus
+
+def mutate(lines, labels, rng):
+    """Mutated copy of a markdown output, as (text, indexes of the original lines kept with their value)"""
+    kept = list(range(len(lines)))
+    lines = [line.rstrip('\r') for line in lines]
+
+    # A numeric value the model could not compute - its field is no longer expected
+    blanked = None
+    numeric_lines = [label['line'] for label in labels.values() if not isinstance(label['value'], str)]
+    if numeric_lines and rng.random() < 0.2:
+        blanked = rng.choice(numeric_lines)
+        lines[blanked] = NUMBER_PATTERN.sub('N/A', lines[blanked], count=1)
+
+    if rng.random() < 0.3 and len(kept) > 1:
+        kept.pop(rng.randrange(len(kept)))
+    if rng.random() < 0.3:
+        rng.shuffle(kept)
+    out = [lines[i] for i in kept]
+
+    if rng.random() < 0.3:
+        bullet = rng.choice(['• ', '* ', '- ', '+ '])
+        out = [re.sub(r'^(\s*)[-*] ', r'\g<1>' + bullet, line) for line in out]
+    if rng.random() < 0.3:
+        out = [line.replace(':**', '**:') for line in out]
+    if rng.random() < 0.3:
+        out = [line.lower() if ':' in line else line for line in out]
+    if rng.random() < 0.3:
+        out = ['   ' + line + ' \t' for line in out]
+    if rng.random() < 0.3:
+        for _ in range(rng.randint(1, 3)):
+            out.insert(rng.randint(0, len(out)), rng.choice(NOISE_LINES))
+
+    newline = '\r\n' if rng.random() < 0.3 else '\n'
+    return newline.join(out), [i for i in kept if i != blanked]
+
+def expected_fields(labels, kept=None):
+    """The labelled fields, or only those on the lines in kept"""
+    return {field: label['value'] for field, label in labels.items()
+            if kept is None or label['line'] in kept}
+
+def same_value(expected, found):
+    if isinstance(expected, float):
+        return isinstance(found, float) and math.isclose(expected, found)
+    return isinstance(found, str) and expected.lower() == found.lower()
+
+def main():
+    mutations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rng = random.Random(int(sys.argv[2]) if len(sys.argv) > 2 else 0)
+    corpus = load_corpus()
+
+    cases = []
+    for name, (text, labels) in corpus.items():
+        cases.append((text, expected_fields(labels)))
+        if name.endswith('.json'):
+            continue
+        lines = text.split('\n')
+        for _ in range(mutations):
+            mutated, kept = mutate(lines, labels, rng)
+            cases.append((mutated, expected_fields(labels, kept)))
+
+    # Failure rate per field: missed or misread, plus found where the output had none
+    expected_count, failures, spurious = Counter(), Counter(), Counter()
+    for text, expected in cases:
+        found = extract_gradio_fields(text)
+        for field, value in expected.items():
+            expected_count[field] += 1
+            if not same_value(value, found.get(field)):
+                failures[field] += 1
+        for field in found.keys() - expected.keys():
+            spurious[field] += 1
+
+    print(f"{len(corpus)} recorded outputs, {len(cases)} cases with mutations\n")
+    print(f"{'field':<24}{'expected':>10}{'failed':>10}{'rate':>9}{'spurious':>10}")
+    for field in GRADIO_FIELDS:
+        count = expected_count[field]
+        rate = failures[field] / count if count else 0.0
+        print(f"{field:<24}{count:>10}{failures[field]:>10}{rate:>9.2%}{spurious[field]:>10}")
+
+    # Throughput
+    texts = [text for text, _ in cases]
+    size = sum(len(text.encode('utf-8')) for text in texts)
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        # parse_gradio_results prints a warning for every output with missing fields
+        best = best_time(lambda: [parse_gradio_results(text) for text in texts])
+    print(f"\nparse_gradio_results: {len(texts) / best:,.0f} outputs/s, "
+          f"{size / best / 1e6:.1f} MB/s ({best * 1e6 / len(texts):.1f} µs/output)")
+
+    total_failures = sum(failures.values()) + sum(spurious.values())
+    return 1 if total_failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
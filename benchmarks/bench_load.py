@@ -0,0 +1,199 @@
+"""
+Load test: concurrent logged-in sessions in one app process
+
+Simulates N sessions at once against the fakes in fakes.py, for each N in
+--sessions. Each session logs in through authenticate_user(), then until
+--duration runs out repeatedly browses My Videos (two pages plus their
+signed URLs) and analyzes a new clip through the background job queue,
+polling like the Analyze tab does. All sessions share one process - the
+job executor, Gradio client, query cache and connection pool - as they do
+on one replica.
+
+Each session gets its own Streamlit session state but no script run, so
+this measures the backend side of the app (contention for analysis
+workers, Supabase requests and the GIL), not page rendering; bench_app.py
+covers rendering.
+
+Prints throughput and latency for each N, and the saturation point: the
+last N before analysis throughput stops growing by --min-gain, or before
+analysis p95 exceeds --max-slowdown times its single-session value.
+
+Usage: python benchmarks/bench_load.py [--sessions 1,2,4,8,16,32] [--duration S]
+       [--latency S] [--gradio-latency S] [--videos N] [--csv PATH]
+"""
+import os
+import sys
+import csv
+import time
+import uuid
+import argparse
+import tempfile
+import threading
+
+from common import import_app
+from fakes import FakeBackend, install
+
+POLL_SECONDS = 0.05
+CLIP_BYTES = 256 * 1024
+
+class Upload:
+    """Just enough of an UploadedFile for VideoBuffer"""
+
+    def __init__(self, name):
+        self.name = name
+        self.type = 'video/mp4'
+        self.file_id = uuid.uuid4().hex
+        # Unique bytes, so every analysis misses the result cache
+        self._data = os.urandom(CLIP_BYTES)
+
+    def getbuffer(self):
+        return memoryview(self._data)
+
+def attach_session(main_script_path):
+    """Give the calling thread a fresh session state, as if it were a new browser session"""
+    from streamlit.runtime.scriptrunner_utils.script_run_context import ScriptRunContext, add_script_run_ctx
+    from streamlit.runtime.state import SafeSessionState, SessionState
+    from streamlit.runtime.pages_manager import PagesManager
+    from streamlit.runtime.fragment import MemoryFragmentStorage
+    from streamlit.runtime.memory_uploaded_file_manager import MemoryUploadedFileManager
+
+    add_script_run_ctx(threading.current_thread(), ScriptRunContext(
+        session_id=uuid.uuid4().hex,
+        _enqueue=lambda message: None,
+        query_string='',
+        session_state=SafeSessionState(SessionState(), lambda: None),
+        uploaded_file_mgr=MemoryUploadedFileManager('/load-test/upload'),
+        main_script_path=main_script_path,
+        user_info={},
+        fragment_storage=MemoryFragmentStorage(),
+        pages_manager=PagesManager(main_script_path, setup_watcher=False),
+    ))
+
+def percentile(values, quantile):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(quantile * len(values)))]
+
+def run_session(app, username, deadline, timings):
+    """One simulated session: log in, then browse and analyze until deadline"""
+    st = app.st
+
+    started = time.perf_counter()
+    user_id, is_admin, _, error = app.authenticate_user(f'{username}@example.com', 'password')
+    if error:
+        raise RuntimeError(f"{username} could not log in: {error}")
+    st.session_state.user_id = user_id
+    st.session_state.is_admin = is_admin
+    timings['login'].append(time.perf_counter() - started)
+
+    while time.monotonic() < deadline:
+        # My Videos: first page, next page, playback URLs
+        started = time.perf_counter()
+        videos, cursor, _ = app.get_user_videos(user_id, 25)
+        app.get_video_urls(videos['file_path'].dropna().tolist())
+        if cursor:
+            videos, _, _ = app.get_user_videos(user_id, 25, cursor)
+            app.get_video_urls(videos['file_path'].dropna().tolist())
+        if time.monotonic() < deadline:
+            timings['browse'].append(time.perf_counter() - started)
+
+        # Analyze a new clip and wait for the job like the Analyze tab's poller
+        started = time.perf_counter()
+        video = app.VideoBuffer(Upload(f'{username}-{uuid.uuid4().hex[:6]}.mp4'))
+        job_id = app.submit_analysis_job(video, user_id)
+        video.release()
+        while app.get_analysis_job(job_id)['status'] in ('queued', 'running'):
+            time.sleep(POLL_SECONDS)
+        if time.monotonic() < deadline:
+            timings['analysis'].append(time.perf_counter() - started)
+
+def run_level(app, sessions, args):
+    """Run `sessions` concurrent sessions for args.duration seconds"""
+    timings = {'login': [], 'browse': [], 'analysis': []}
+    errors = []
+    deadline = time.monotonic() + args.duration
+
+    def target(username):
+        try:
+            attach_session(app.__file__)
+            run_session(app, username, deadline, timings)
+        except Exception as e:
+            errors.append(f"{username}: {e}")
+
+    threads = [threading.Thread(target=target, args=(f'rider{i}',), name=f'session-{i}') for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    # Work still in flight at the deadline is waited for but not counted
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise RuntimeError(f"{len(errors)} sessions failed, e.g. {errors[0]}")
+
+    return {
+        'sessions': sessions,
+        'analyses_per_min': len(timings['analysis']) / args.duration * 60,
+        'views_per_s': len(timings['browse']) / args.duration,
+        'login_p95': percentile(timings['login'], 0.95),
+        'browse_p50': percentile(timings['browse'], 0.5),
+        'browse_p95': percentile(timings['browse'], 0.95),
+        'analysis_p50': percentile(timings['analysis'], 0.5),
+        'analysis_p95': percentile(timings['analysis'], 0.95),
+    }
+
+def saturation_point(rows, min_gain, max_slowdown):
+    """Last session count before throughput flattens or analysis latency blows up"""
+    baseline_p95 = rows[0]['analysis_p95']
+    for previous, row in zip(rows, rows[1:]):
+        flattened = row['analyses_per_min'] < previous['analyses_per_min'] * (1 + min_gain)
+        slowed = row['analysis_p95'] > baseline_p95 * max_slowdown
+        if flattened or slowed:
+            return previous['sessions'], "throughput stopped growing" if flattened else "analysis p95 degraded"
+    return None, None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--sessions', default='1,2,4,8,16,32', help="comma-separated session counts")
+    parser.add_argument('--duration', type=float, default=10, help="seconds per session count")
+    parser.add_argument('--latency', type=float, default=0.02, help="seconds per Supabase request")
+    parser.add_argument('--gradio-latency', type=float, default=1.0, help="seconds per Gradio prediction")
+    parser.add_argument('--videos', type=int, default=200, help="videos per session user")
+    parser.add_argument('--min-gain', type=float, default=0.1)
+    parser.add_argument('--max-slowdown', type=float, default=2.0)
+    parser.add_argument('--csv', help="also write the curve to this CSV file")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.sessions.split(',')]
+
+    os.environ['METRICS_DB_PATH'] = os.path.join(tempfile.mkdtemp(prefix='tru-stride-load-'), 'metrics.sqlite3')
+    backend = FakeBackend(args.latency, args.gradio_latency)
+    for i in range(max(levels)):
+        backend.add_user(f'rider{i}', videos=args.videos)
+    install(backend)
+    app = import_app()
+
+    print(f"ANALYSIS_WORKERS={app.ANALYSIS_WORKERS}, Supabase latency {args.latency * 1000:.0f}ms, "
+          f"Gradio latency {args.gradio_latency:.1f}s, {args.duration:.0f}s per level")
+    print(f"{'sessions':>8} {'analyses/min':>13} {'views/s':>8} {'login p95':>10} "
+          f"{'browse p50':>11} {'browse p95':>11} {'analysis p50':>13} {'analysis p95':>13}")
+    rows = []
+    for sessions in levels:
+        row = run_level(app, sessions, args)
+        rows.append(row)
+        print(f"{sessions:>8} {row['analyses_per_min']:>13.1f} {row['views_per_s']:>8.1f} {row['login_p95']:>9.3f}s "
+              f"{row['browse_p50']:>10.3f}s {row['browse_p95']:>10.3f}s {row['analysis_p50']:>12.2f}s {row['analysis_p95']:>12.2f}s")
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+    sessions, reason = saturation_point(rows, args.min_gain, args.max_slowdown)
+    if sessions is None:
+        print(f"No saturation up to {levels[-1]} sessions")
+    else:
+        print(f"Saturation point: about {sessions} concurrent sessions ({reason} beyond that)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
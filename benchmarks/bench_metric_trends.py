@@ -0,0 +1,64 @@
+"""
+Benchmark: the My Videos trends view for users with long histories
+
+Times turning a user_metric_history payload (one JSON array per metric) into
+the trends DataFrame - rolling means and change points for every metric -
+and checks it against TREND_LATENCY_BUDGET. The database call itself is
+stubbed out, so this measures only the app's share of the budget. The query
+cache is cleared before every run, so each one parses the payload afresh.
+
+Usage: python benchmarks/bench_metric_trends.py [analyses ...]
+"""
+import sys
+import random
+from datetime import datetime, timedelta
+
+from common import import_app, best_time
+
+app = import_app()
+from streamlit_app import TREND_METRICS, TREND_MAX_POINTS, TREND_LATENCY_BUDGET, get_metric_trends  # noqa: E402
+
+def history_payload(analyses, seed=0):
+    """What user_metric_history returns for a user with `analyses` videos"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    payload = {'upload_date': [(start + timedelta(hours=7 * i)).isoformat() for i in range(analyses)]}
+    for metric in TREND_METRICS:
+        level = rng.uniform(0.5, 8)
+        payload[metric] = [round(level + rng.gauss(0, 0.3) + (1 if i > analyses // 2 else 0), 3)
+                           for i in range(analyses)]
+    return payload
+
+class StubSupabase:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def rpc(self, name, params):
+        return self
+
+    def execute(self):
+        return self
+
+    @property
+    def data(self):
+        return self.payload
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 1000, TREND_MAX_POINTS]
+    over_budget = False
+
+    print(f"{'analyses':>10}{'time':>12}  budget {TREND_LATENCY_BUDGET * 1000:.0f} ms")
+    for size in sizes:
+        # The database never returns more than TREND_MAX_POINTS
+        stub = StubSupabase(history_payload(min(size, TREND_MAX_POINTS)))
+        app.init_supabase = lambda: stub
+        # get_user_metric_history is a cached query - without the clear every size
+        # after the first would time the first size's cached history
+        best = best_time(lambda: get_metric_trends('user'), setup=app.get_query_cache.clear)
+        over_budget |= best > TREND_LATENCY_BUDGET
+        print(f"{size:>10}{best * 1000:>10.1f} ms")
+
+    return 1 if over_budget else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
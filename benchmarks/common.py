@@ -0,0 +1,33 @@
+"""Shared helpers for the benchmarks"""
+import os
+import sys
+import time
+import logging
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+def quiet_streamlit():
+    """Bare-mode imports and AppTest runs warn on every st.* call"""
+    logging.disable(logging.WARNING)
+
+def import_app():
+    """Import streamlit_app outside `streamlit run`
+
+    Importing it does not touch the network - the Gradio client is only connected
+    after login, and fakes.install() swaps it out for benchmarks that log in.
+    """
+    quiet_streamlit()
+    sys.path.insert(0, REPO_ROOT)
+    import streamlit_app
+    return streamlit_app
+
+def best_time(fn, repeat=5, setup=None):
+    """Best wall time of fn() over repeat runs, in seconds; setup() runs untimed before each"""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
@@ -0,0 +1,407 @@
+"""
+Local stand-ins for Supabase and the Gradio space
+
+install(backend) swaps supabase.create_client and gradio_client.Client for
+fakes backed by an in-memory FakeBackend, so the real app - including under
+streamlit.testing's AppTest, which re-imports it on every run - talks to
+these instead of the network. Every request sleeps for the backend's
+configured latency and is counted in backend.calls.
+
+Only the PostgREST, RPC, storage and auth calls the app makes are
+implemented; the RPCs mirror the SQL functions in SUPABASE_SETUP.md.
+"""
+import os
+import re
+import sys
+import time
+import types
+import datetime
+import threading
+from collections import Counter
+
+ANALYSIS_RESULTS = {
+    'primary_gait': 'Stride: NORMAL', 'classification': 'NORMAL', 'confidence': 0.86,
+    'stride_length': 2.2, 'rhythm_score': 4.1, 'symmetry_score': 2.5, 'stride_variability': 0.589,
+    'knee_angle': 66.0, 'body_length_variation': 0.749, 'processing_time': 2.37,
+    'details': 'Consistent stride pattern',
+}
+
+GRADIO_OUTPUT = """✅ **Stride Analysis Results**
+**Classification:** NORMAL
+**Confidence:** 86%
+**Processing Time:** 2.37 seconds
+**Details:** Consistent stride pattern
+**Metrics:**
+- Stride Variability: 0.589
+- Mean Knee Angle: 66.0°
+- Body Length Variation: 0.749
+"""
+
+TREND_METRICS = ['rhythm_score', 'symmetry_score', 'stride_variability', 'knee_angle', 'body_length_variation']
+
+class FakeBackend:
+    """In-memory profiles and videos tables plus request latency and call counters
+
+    latency applies to every database, storage and auth request, gradio_latency
+    to each prediction.
+    """
+
+    def __init__(self, latency=0.0, gradio_latency=0.0):
+        self.latency = latency
+        self.gradio_latency = gradio_latency
+        self.tables = {'profiles': [], 'videos': []}
+        self.login_user_id = None
+        self.emails = {}
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def request(self, name, latency=None):
+        """Count one request and wait out its latency"""
+        with self._lock:
+            self.calls[name] += 1
+        delay = self.latency if latency is None else latency
+        if delay:
+            time.sleep(delay)
+
+    def reset_calls(self):
+        with self._lock:
+            calls = dict(self.calls)
+            self.calls.clear()
+        return calls
+
+    def add_user(self, username, is_admin=False, videos=0):
+        """Add a profile (and its videos, one every 7 hours up to now); returns the user id
+
+        The user signs in as <username>@example.com.
+        """
+        user_id = f"user-{len(self.tables['profiles']):06d}"
+        self.emails[f'{username}@example.com'] = user_id
+        created_at = datetime.datetime(2025, 1, 1) + datetime.timedelta(minutes=len(self.tables['profiles']))
+        self.tables['profiles'].append({'id': user_id, 'username': username, 'is_admin': is_admin,
+                                        'created_at': created_at.isoformat()})
+        now = datetime.datetime.now().replace(microsecond=0)
+        for i in range(videos):
+            video_id = len(self.tables['videos']) + 1
+            self.tables['videos'].append({
+                'id': video_id, 'user_id': user_id, 'filename': f'clip-{video_id}.mp4',
+                'upload_date': (now - datetime.timedelta(hours=7 * (videos - i))).isoformat(),
+                'file_path': f'{user_id}/clip-{video_id}.mp4',
+                'analysis_results': dict(ANALYSIS_RESULTS),
+            })
+        return user_id
+
+    def log_in_as(self, user_id):
+        """Make sign-ins with unknown emails succeed as user_id"""
+        self.login_user_id = user_id
+
+    # RPCs - see SUPABASE_SETUP.md
+
+    def _video_counts(self):
+        return Counter(video['user_id'] for video in self.tables['videos'])
+
+    def admin_dashboard_totals(self):
+        return [{'total_users': len(self.tables['profiles']), 'total_videos': len(self.tables['videos'])}]
+
+    def admin_videos_per_user(self):
+        counts = self._video_counts()
+        rows = [{'username': profile['username'], 'video_count': counts[profile['id']], 'is_admin': profile['is_admin']}
+                for profile in self.tables['profiles']]
+        return sorted(rows, key=lambda row: (-row['video_count'], row['username']))
+
+    def admin_daily_uploads(self, days=30):
+        counts = Counter(video['upload_date'][:10] for video in self.tables['videos'])
+        today = datetime.date.today()
+        dates = [str(today - datetime.timedelta(days=offset)) for offset in range(days - 1, -1, -1)]
+        return [{'date': date, 'uploads': counts[date]} for date in dates]
+
+    def user_metric_history(self, target_user_id, max_points=5000):
+        videos = sorted((video for video in self.tables['videos'] if video['user_id'] == target_user_id),
+                        key=lambda video: (video['upload_date'], video['id']))[-max_points:]
+        history = {'upload_date': [video['upload_date'] for video in videos]}
+        for metric in TREND_METRICS:
+            history[metric] = [(video.get('analysis_results') or {}).get(metric) for video in videos]
+        return history
+
+    def admin_users_page(self, pattern=None, page_size=25, after_created_at=None, after_id=None):
+        counts = self._video_counts()
+        matcher = _like_matcher(pattern)
+        profiles = sorted(self.tables['profiles'], key=lambda profile: (profile['created_at'], profile['id']), reverse=True)
+        if after_id is not None:
+            profiles = [profile for profile in profiles if (profile['created_at'], profile['id']) < (after_created_at, after_id)]
+        page = [profile for profile in profiles if matcher(profile['username'])][:page_size + 1]
+        return [dict(profile, video_count=counts[profile['id']]) for profile in page]
+
+    def admin_user_counts(self, pattern=None):
+        matcher = _like_matcher(pattern)
+        profiles = self.tables['profiles']
+        return [{'matching_users': sum(matcher(profile['username']) for profile in profiles),
+                 'admin_users': sum(profile['is_admin'] for profile in profiles),
+                 'total_users': len(profiles)}]
+
+    def admin_set_admin_status(self, promote, demote):
+        for profile in self.tables['profiles']:
+            if profile['id'] in promote or profile['id'] in demote:
+                profile['is_admin'] = profile['id'] in promote
+        return None
+
+def _like_matcher(pattern):
+    """ILIKE with % wildcards and backslash escapes, as a predicate"""
+    if pattern is None:
+        return lambda value: True
+    parts = re.split(r'(\\.|%|_)', pattern)
+    regex = ''.join('.*' if part == '%' else '.' if part == '_' else re.escape(part.lstrip('\\')) for part in parts)
+    compiled = re.compile(regex, re.IGNORECASE | re.DOTALL)
+    return lambda value: compiled.fullmatch(value) is not None
+
+# PostgREST
+
+def _split_top_level(expression):
+    """Split on commas outside parentheses and double quotes"""
+    parts, depth, quoted, current = [], 0, False, ''
+    for char in expression:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        if char == ',' and depth == 0 and not quoted:
+            parts.append(current)
+            current = ''
+        else:
+            current += char
+    parts.append(current)
+    return parts
+
+COMPARISONS = {
+    'eq': lambda a, b: a == b, 'lt': lambda a, b: a < b, 'gt': lambda a, b: a > b,
+    'lte': lambda a, b: a <= b, 'gte': lambda a, b: a >= b,
+}
+
+def _condition(expression):
+    """Predicate for one or_() condition such as id.lt.5 or and(a.eq."x",b.gt.1)"""
+    for group, combine in (('and(', all), ('or(', any)):
+        if expression.startswith(group):
+            conditions = [_condition(part) for part in _split_top_level(expression[len(group):-1])]
+            return lambda row: combine(condition(row) for condition in conditions)
+
+    column, operator, value = expression.split('.', 2)
+    value = value.strip('"')
+
+    def matches(row):
+        actual = row.get(column)
+        if actual is None:
+            return False
+        expected = type(actual)(value) if isinstance(actual, (int, float)) and not isinstance(actual, bool) else value
+        return COMPARISONS[operator](actual, expected)
+    return matches
+
+def _project(row, columns):
+    """Apply a select list, including alias:column->key JSON paths"""
+    if columns.strip() == '*':
+        return dict(row)
+    selected = {}
+    for column in _split_top_level(columns):
+        alias, _, source = column.strip().partition(':')
+        if not source:
+            source = alias
+        base, *path = re.split(r'->>?', source)
+        value = row.get(base)
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        selected[alias] = value
+    return selected
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+class FakeQuery:
+    """A PostgREST request builder over one FakeBackend table"""
+
+    def __init__(self, backend, table):
+        self.backend, self.table = backend, table
+        self.operation, self.payload = 'select', None
+        self.columns, self.count = '*', None
+        self.filters, self.ordering = [], []
+        self.row_limit, self.row_range = None, None
+
+    def select(self, columns='*', count=None):
+        self.columns, self.count = columns, count
+        return self
+
+    def insert(self, payload):
+        self.operation, self.payload = 'insert', payload
+        return self
+
+    def update(self, payload):
+        self.operation, self.payload = 'update', payload
+        return self
+
+    def delete(self):
+        self.operation = 'delete'
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) > value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) < value)
+        return self
+
+    def or_(self, expression):
+        conditions = [_condition(part) for part in _split_top_level(expression)]
+        self.filters.append(lambda row: any(condition(row) for condition in conditions))
+        return self
+
+    def order(self, column, desc=False):
+        self.ordering.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    def range(self, start, end):
+        self.row_range = (start, end)
+        return self
+
+    def execute(self):
+        self.backend.request(f'{self.operation} {self.table}')
+        rows = self.backend.tables[self.table]
+
+        if self.operation == 'insert':
+            inserted = []
+            for row in self.payload if isinstance(self.payload, list) else [self.payload]:
+                row = dict(row)
+                row.setdefault('id', len(rows) + 1)
+                row.setdefault('upload_date', datetime.datetime.now().isoformat())
+                rows.append(row)
+                inserted.append(row)
+            return FakeResponse(inserted)
+
+        selected = [row for row in rows if all(matches(row) for matches in self.filters)]
+        if self.operation == 'update':
+            for row in selected:
+                row.update(self.payload)
+            return FakeResponse(selected)
+        if self.operation == 'delete':
+            self.backend.tables[self.table] = [row for row in rows if row not in selected]
+            return FakeResponse(selected)
+
+        for column, desc in reversed(self.ordering):
+            selected.sort(key=lambda row: row.get(column), reverse=desc)
+        total = len(selected)
+        if self.row_range:
+            selected = selected[self.row_range[0]:self.row_range[1] + 1]
+        if self.row_limit is not None:
+            selected = selected[:self.row_limit]
+        return FakeResponse([_project(row, self.columns) for row in selected], total if self.count else None)
+
+class FakeRPC:
+    def __init__(self, backend, name, params):
+        self.backend, self.name, self.params = backend, name, params or {}
+
+    def execute(self):
+        self.backend.request(f'rpc {self.name}')
+        return FakeResponse(getattr(self.backend, self.name)(**self.params))
+
+class FakeStorage:
+    """The videos bucket; uploads are counted and discarded"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def from_(self, bucket):
+        return self
+
+    def upload(self, path, file, file_options=None):
+        self.backend.request('storage upload')
+        return {'Key': path}
+
+    def create_signed_urls(self, paths, expires_in):
+        self.backend.request('storage sign')
+        return [{'path': path, 'signedURL': f'http://fake-storage/{path}?token=1', 'error': None} for path in paths]
+
+    def remove(self, paths):
+        self.backend.request('storage remove')
+        return [{'name': path} for path in paths]
+
+class FakeAuth:
+    def __init__(self, backend):
+        self.backend = backend
+        self.session = None
+
+    def sign_in_with_password(self, credentials):
+        self.backend.request('auth sign_in')
+        user_id = self.backend.emails.get(credentials.get('email'), self.backend.login_user_id)
+        user = types.SimpleNamespace(id=user_id, email=credentials.get('email'),
+                                     email_confirmed_at='2025-01-01T00:00:00', user_metadata={})
+        self.session = types.SimpleNamespace(access_token=f'access-{user.id}', refresh_token=f'refresh-{user.id}')
+        return types.SimpleNamespace(user=user, session=self.session)
+
+    def set_session(self, access_token, refresh_token):
+        self.backend.request('auth set_session')
+        self.session = types.SimpleNamespace(access_token=access_token, refresh_token=refresh_token)
+        return types.SimpleNamespace(session=self.session)
+
+    def get_session(self):
+        # Local in the real client too, until the access token expires
+        return self.session
+
+    def sign_out(self):
+        self.backend.request('auth sign_out')
+        self.session = None
+
+class FakeSupabase:
+    def __init__(self, backend):
+        self.backend = backend
+        self.auth = FakeAuth(backend)
+        self.storage = FakeStorage(backend)
+
+    def table(self, name):
+        return FakeQuery(self.backend, name)
+
+    def rpc(self, name, params=None):
+        return FakeRPC(self.backend, name, params)
+
+class FakeGradioClient:
+    """Stands in for gradio_client.Client connected to the analyzer space"""
+
+    backend = None
+
+    def __init__(self, src, *args, **kwargs):
+        self.src = 'http://fake-space/'
+
+    def predict(self, *args, api_name=None, **kwargs):
+        self.backend.request('gradio predict', self.backend.gradio_latency)
+        return (GRADIO_OUTPUT, None)
+
+def install(backend):
+    """Route the app's Supabase and Gradio clients to backend"""
+    import supabase
+
+    os.environ.setdefault('SUPABASE_URL', 'http://fake-supabase')
+    os.environ.setdefault('SUPABASE_ANON_KEY', 'anon-key')
+    os.environ.setdefault('SUPABASE_SERVICE_ROLE_KEY', 'service-role-key')
+    supabase.create_client = lambda url, key, options=None: FakeSupabase(backend)
+
+    try:
+        import gradio_client
+    except ImportError:
+        gradio_client = types.ModuleType('gradio_client')
+        sys.modules['gradio_client'] = gradio_client
+    FakeGradioClient.backend = backend
+    gradio_client.Client = FakeGradioClient
+    gradio_client.handle_file = lambda path: path
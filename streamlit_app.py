@@ -1,59 +1,484 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+# pandas, plotly, supabase, httpx and gradio_client are imported where they are
+# first needed, so the login page renders without loading them - see
+# benchmarks/bench_cold_start.py for the budget
 from datetime import datetime
 import tempfile
 import os
+import io
 import json
 import re
-from supabase import create_client, Client
+import ast
+import html
+import base64
+import hashlib
+import threading
+import weakref
+import time
+import uuid
+import functools
+import bisect
+import sqlite3
+import sys
+from collections import OrderedDict, Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, asdict, fields
+from urllib.parse import urljoin
+# Latency metrics
+# Pipeline stages wrapped in @timed_stage have their durations recorded as
+# histograms in a local SQLite file: one count per (stage, time period, latency
+# bucket). Buckets are log-spaced, so p50/p95/p99 can be estimated from the
+# counts and the file stays small however many calls are timed. Samples are
+# batched in memory and written every METRICS_FLUSH_SECONDS.
+
+METRICS_DB_PATH = os.getenv("METRICS_DB_PATH", os.path.join(tempfile.gettempdir(), "tru-stride-metrics.sqlite3"))
+METRICS_PERIOD_SECONDS = 300
+METRICS_FLUSH_SECONDS = 10
+METRICS_RETENTION_DAYS = 30
+# Upper bounds in seconds, 10 per decade from 0.1ms to 100s; slower calls land in one overflow bucket
+LATENCY_BUCKETS = [10 ** (exponent / 10) for exponent in range(-40, 21)]
+
+@st.cache_resource
+def get_metrics_store():
+    """Process-wide metrics store: the SQLite connection plus samples not yet written"""
+    connection = sqlite3.connect(METRICS_DB_PATH, check_same_thread=False)
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS stage_latency (
+            stage TEXT NOT NULL,
+            period INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (stage, period, bucket)
+        ) WITHOUT ROWID
+    """)
+    return {'connection': connection, 'pending': {}, 'flushed_at': time.time(), 'lock': threading.Lock()}
+
+def record_latency(stage, seconds):
+    """Add one duration to stage's histogram"""
+    store = get_metrics_store()
+    key = (stage, int(time.time() // METRICS_PERIOD_SECONDS) * METRICS_PERIOD_SECONDS,
+           bisect.bisect_left(LATENCY_BUCKETS, seconds))
+    with store['lock']:
+        store['pending'][key] = store['pending'].get(key, 0) + 1
+        if time.time() - store['flushed_at'] >= METRICS_FLUSH_SECONDS:
+            _flush_metrics(store)
+
+def _flush_metrics(store):
+    """Write pending samples and drop expired periods (caller holds the lock)"""
+    try:
+        with store['connection'] as connection:
+            connection.executemany(
+                "INSERT INTO stage_latency (stage, period, bucket, count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (stage, period, bucket) DO UPDATE SET count = count + excluded.count",
+                [key + (count,) for key, count in store['pending'].items()]
+            )
+            connection.execute("DELETE FROM stage_latency WHERE period < ?",
+                               (time.time() - METRICS_RETENTION_DAYS * 86400,))
+        store['pending'].clear()
+    except sqlite3.Error as e:
+        print(f"Metrics flush error: {e}")
+    store['flushed_at'] = time.time()
+
+def timed_stage(stage):
+    """Decorator recording each call's duration (including failed calls) under stage"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_latency(stage, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+def get_latency_histograms(since):
+    """Histogram counts of every stage for periods starting at or after since (epoch seconds)"""
+    import pandas as pd
+
+    store = get_metrics_store()
+    with store['lock']:
+        _flush_metrics(store)
+        return pd.read_sql_query(
+            "SELECT stage, period, bucket, count FROM stage_latency WHERE period >= ? ORDER BY stage, period, bucket",
+            store['connection'], params=(since,)
+        )
+
+def latency_percentiles(histograms, by, quantiles=(0.5, 0.95, 0.99)):
+    """Estimate latency quantiles (seconds) per group of the by columns from histogram counts
+
+    Each estimate is interpolated log-linearly inside the bucket the quantile falls in.
+    """
+    import pandas as pd
+
+    counts = histograms.groupby(by + ['bucket'])['count'].sum().reset_index()
+    grouped = counts.groupby(by)['count']
+    cumulative = grouped.cumsum()
+    totals = grouped.transform('sum')
+
+    # Bucket i covers (LATENCY_BUCKETS[i - 1], LATENCY_BUCKETS[i]]; the overflow bucket is reported as its lower bound
+    lower = counts['bucket'].map(lambda bucket: LATENCY_BUCKETS[bucket - 1] if bucket else LATENCY_BUCKETS[0] / 10 ** 0.1)
+    upper = counts['bucket'].map(lambda bucket: LATENCY_BUCKETS[min(bucket, len(LATENCY_BUCKETS) - 1)])
+
+    result = grouped.sum().to_frame()
+    for quantile in quantiles:
+        target = quantile * totals
+        # First bucket of each group whose cumulative count reaches the target
+        hit = counts[cumulative >= target].groupby(by).head(1).index
+        fraction = (target[hit] - cumulative[hit] + counts.loc[hit, 'count']) / counts.loc[hit, 'count']
+        estimate = lower[hit] * (upper[hit] / lower[hit]) ** fraction
+        result[f"p{round(quantile * 100)}"] = pd.Series(estimate.values, index=counts.loc[hit, by].set_index(by).index)
+    return result.reset_index()
+
+# Rerun profiling
+# Off unless PROFILE_RERUNS=1 is set or an admin opens the app with ?profile=1;
+# when off, a rerun pays for one dict lookup. When on, a background thread
+# samples the script thread's stack every PROFILE_SAMPLE_SECONDS while main()
+# or a tab's fragment runs, and each rerun is written to PROFILE_DIR as folded
+# stacks (one "outer;...;inner count" line per distinct stack) for
+# flamegraph.pl or speedscope.
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "tru-stride-profiles"))
+PROFILE_SAMPLE_SECONDS = 0.005
+PROFILE_KEEP = 200  # Newest reruns kept on disk
+PROFILE_HOTSPOT_RERUNS = 50  # Newest reruns summed into the hotspots table
+
+class StackSampler:
+    """Samples one thread's Python stack on a background thread, counting each distinct stack"""
+
+    def __init__(self, thread_id, stop_code, interval=PROFILE_SAMPLE_SECONDS):
+        self.thread_id = thread_id
+        self.stop_code = stop_code  # Frames outside this function's frame are left out
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='rerun-profiler', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame.f_code is not self.stop_code:
+                code = frame.f_code
+                stack.append(f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+def profiling_enabled():
+    """Whether this rerun should be profiled"""
+    if os.getenv("PROFILE_RERUNS") == "1":
+        return True
+    return st.session_state.get('is_admin', False) and st.query_params.get('profile') == '1'
+
+_profiling = threading.local()
+
+def run_profiled(func):
+    """Run func(), sampling it into a folded-stacks file when profiling is enabled"""
+    if not profiling_enabled():
+        return func()
+
+    sampler = StackSampler(threading.get_ident(), run_profiled.__code__)
+    started = time.perf_counter()
+    _profiling.active = True
+    try:
+        with sampler:
+            return func()
+    finally:
+        _profiling.active = False
+        # st.rerun() and st.stop() end a run by raising - those reruns are written too
+        _write_profile(sampler.stacks, time.perf_counter() - started)
+
+def profiled_fragment(**fragment_options):
+    """st.fragment whose own reruns are profiled too - they don't go through main()"""
+    def decorator(func):
+        @functools.wraps(func)
+        def profiled(*args, **kwargs):
+            # Called during a profiled full rerun, it is already being sampled
+            if getattr(_profiling, 'active', False):
+                return func(*args, **kwargs)
+            return run_profiled(functools.partial(func, *args, **kwargs))
+        return st.fragment(profiled, **fragment_options)
+    return decorator
+
+def _write_profile(stacks, seconds):
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}-{seconds * 1000:.0f}ms.folded"
+        with open(os.path.join(PROFILE_DIR, name), 'w') as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        for old in list_profiles()[PROFILE_KEEP:]:
+            _remove_file(os.path.join(PROFILE_DIR, old))
+    except OSError as e:
+        print(f"Profile write error: {e}")
+
+def list_profiles():
+    """Folded-stack files in PROFILE_DIR, newest first"""
+    try:
+        return sorted((name for name in os.listdir(PROFILE_DIR) if name.endswith('.folded')), reverse=True)
+    except FileNotFoundError:
+        return []
+
+def get_profile_hotspots(names):
+    """Sum folded-stack files into per-function sample counts
+
+    self_pct is the share of samples with the function on top of the stack,
+    total_pct the share with it anywhere on the stack.
+    """
+    import pandas as pd
+
+    self_samples, total_samples, samples = Counter(), Counter(), 0
+    for name in names:
+        with open(os.path.join(PROFILE_DIR, name)) as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                frames = stack.split(';')
+                count = int(count)
+                samples += count
+                self_samples[frames[-1]] += count
+                for frame in set(frames):
+                    total_samples[frame] += count
+
+    hotspots = pd.DataFrame({'function': list(total_samples),
+                             'self_samples': [self_samples[frame] for frame in total_samples],
+                             'total_samples': list(total_samples.values())})
+    if samples:
+        hotspots['self_pct'] = hotspots['self_samples'] / samples
+        hotspots['total_pct'] = hotspots['total_samples'] / samples
+    return hotspots.sort_values(['self_samples', 'total_samples'], ascending=False), samples
+
+# Upload buffers
+# Each uploaded video is copied once into a buffer shared by the preview, the
+# Gradio analysis and the storage upload. Buffers stay in memory while all of
+# them together fit in VIDEO_MEMORY_BUDGET; beyond that a video is spooled to a
+# temp file instead. An in-memory buffer is written to disk only if a consumer
+# needs a path (Gradio does). Hashing and the upload read through their own
+# handles. The preview does not: st.video() reads the whole video into
+# Streamlit's media store (and hashes it) on every run that shows it.
+
+VIDEO_MEMORY_BUDGET = int(os.getenv("VIDEO_MEMORY_BUDGET_MB", "64")) * 1024 * 1024
+
+def _remove_file(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+@st.cache_resource
+def get_video_memory():
+    """Process-wide bytes held by in-memory VideoBuffers"""
+    return {'used': 0, 'lock': threading.Lock()}
+
+def _return_video_memory(memory, size):
+    with memory['lock']:
+        memory['used'] -= size
+
+class VideoBuffer:
+    """An uploaded video held in memory or spooled to a temp file, shared by reference count
+
+    The memory or temp file is freed when the last holder calls release(), or
+    when the buffer is garbage collected (e.g. a session ends mid-upload).
+    """
+
+    @timed_stage('write_temp_file')
+    def __init__(self, uploaded_file):
+        self.name = uploaded_file.name
+        self.type = uploaded_file.type
+        self.file_id = getattr(uploaded_file, 'file_id', None)
+        self._refs = 1
+        self._lock = threading.Lock()
+        self._data, self._path = None, None
+        self._finalizers = []
+        self._return_memory = None
+
+        with uploaded_file.getbuffer() as view:
+            self.size = view.nbytes
+            memory = get_video_memory()
+            with memory['lock']:
+                in_memory = memory['used'] + self.size <= VIDEO_MEMORY_BUDGET
+                if in_memory:
+                    memory['used'] += self.size
+            if in_memory:
+                self._return_memory = weakref.finalize(self, _return_video_memory, memory, self.size)
+                self._data = bytes(view)
+            else:
+                self._spool(view)
+
+    def _spool(self, data):
+        """Write data to this buffer's temp file (caller holds the lock, or the buffer is not shared yet)"""
+        fd, path = tempfile.mkstemp(prefix='tru-stride-', suffix=os.path.splitext(self.name)[1] or '.mp4')
+        finalizer = weakref.finalize(self, _remove_file, path)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                out.write(data)
+        except Exception:
+            finalizer()
+            raise
+        self._finalizers.append(finalizer)
+        self._path = path
+
+    @property
+    def path(self):
+        """Path of the video on disk, spooling an in-memory buffer on first use"""
+        with self._lock:
+            if self._path is None:
+                self._spool(self._data)
+                # Handles already open keep their own reference to the bytes
+                self._data = None
+                self._return_memory()
+            return self._path
+
+    @property
+    def media(self):
+        """What st.video() should get: the bytes while in memory, else the path"""
+        with self._lock:
+            return self._data if self._path is None else self._path
+
+    def acquire(self):
+        with self._lock:
+            self._refs += 1
+        return self
+
+    def release(self):
+        with self._lock:
+            self._refs -= 1
+            if self._refs <= 0:
+                self._data = None
+                for finalizer in self._finalizers + [self._return_memory]:
+                    if finalizer:
+                        finalizer()
+
+    def open(self):
+        """Independent read handle - safe to use alongside other consumers"""
+        with self._lock:
+            data, path = self._data, self._path
+        if path is None:
+            # Shares the bytes rather than copying them
+            return io.BytesIO(data)
+        return open(path, 'rb')
+
+    def read_part(self, offset, size):
+        """Copy size bytes starting at offset, independent of any handle's position"""
+        with self.open() as f:
+            f.seek(offset)
+            return f.read(size)
+
+VIDEO_BUFFER_KEY = '_video_buffer'
+
+def get_session_video_buffer(uploaded_file):
+    """This session's buffer for uploaded_file, copied once per uploaded file"""
+    video = st.session_state.get(VIDEO_BUFFER_KEY)
+    if video is not None and video.file_id == uploaded_file.file_id:
+        return video
+    release_session_video_buffer()
+    video = VideoBuffer(uploaded_file)
+    st.session_state[VIDEO_BUFFER_KEY] = video
+    return video
+
+def release_session_video_buffer():
+    """Drop this session's hold on its buffer (running jobs keep their own)"""
+    video = st.session_state.pop(VIDEO_BUFFER_KEY, None)
+    if video is not None:
+        video.release()
+
 # Video storage functions for Supabase Storage
 
-def upload_video_to_storage(uploaded_file, user_id):
-    """Upload video file to Supabase Storage"""
+@timed_stage('upload_video_to_storage')
+def upload_video_to_storage(video, user_id, upload_id=None):
+    """Upload a VideoBuffer to Supabase Storage
+
+    Every upload gets its own object (user_id/upload_id-filename), so uploading a
+    file with the same name again never replaces a video an earlier analysis
+    points at, and a failed upload can always be deleted.
+    """
     try:
         supabase = init_supabase()
 
-        # Create file path: user_id/filename
-        file_path = f"{user_id}/{uploaded_file.name}"
+        file_path = f"{user_id}/{upload_id or uuid.uuid4().hex}-{video.name}"
 
-        # Upload file to storage
-        result = supabase.storage.from_('videos').upload(
-            path=file_path,
-            file=uploaded_file.getvalue(),
-            file_options={
-                'content-type': uploaded_file.type,
-                'upsert': 'true'  # String instead of boolean
-            }
-        )
+        # Large videos go up in resumable chunks
+        if video.size > UPLOAD_PART_SIZE:
+            upload_video_resumable(supabase, video, file_path, video.size, video.type)
+            return file_path
+
+        # Upload file to storage, streamed from its own handle
+        with video.open() as f:
+            result = supabase.storage.from_('videos').upload(
+                path=file_path,
+                file=f,
+                file_options={
+                    'content-type': video.type,
+                    'upsert': 'true'  # String instead of boolean
+                }
+            )
 
         if result:
             return file_path
         return None
 
     except Exception as e:
+        print(f"Video upload error: {e}")
+        if not _on_script_thread():
+            # No page to show it on - the job records it and saves the analysis without the video
+            raise
         st.error(f"Failed to upload video: {str(e)}")
         return None
 
-def get_video_url(file_path):
-    """Get signed URL for video playback"""
-    try:
-        supabase = init_supabase()
+# Signed URLs expire after an hour; cached URLs are re-signed 5 minutes before that
+SIGNED_URL_EXPIRES_IN = 3600
+SIGNED_URL_REFRESH_MARGIN = 300
+SIGNED_URL_CACHE_SIZE = 500
+SIGNED_URL_CACHE_KEY = '_signed_urls'
 
-        # Get signed URL (expires in 1 hour)
-        result = supabase.storage.from_('videos').create_signed_url(
-            path=file_path,
-            expires_in=3600  # 1 hour
-        )
+def _get_signed_url_cache():
+    """Per-session cache of signed URLs - never shared, since URLs are signed for this user"""
+    if SIGNED_URL_CACHE_KEY not in st.session_state:
+        st.session_state[SIGNED_URL_CACHE_KEY] = TTLCache(SIGNED_URL_CACHE_SIZE, SIGNED_URL_REFRESH_MARGIN)
+    return st.session_state[SIGNED_URL_CACHE_KEY]
 
-        if result:
-            return result['signedURL']
-        return None
+def get_video_urls(file_paths):
+    """Get signed URLs for video playback as {file_path: url}
 
-    except Exception as e:
-        st.error(f"Failed to get video URL: {str(e)}")
-        return None
+    Cached URLs are reused; all other paths are signed with one storage call.
+    """
+    cache = _get_signed_url_cache()
+    urls = {}
+    missing = []
+    for file_path in dict.fromkeys(path for path in file_paths if path):
+        url = cache.get(file_path)
+        if url:
+            urls[file_path] = url
+        else:
+            missing.append(file_path)
+
+    if missing:
+        try:
+            for item in _sign_video_urls(missing):
+                if item.get('signedURL') and not item.get('error'):
+                    urls[item['path']] = item['signedURL']
+                    cache.put(item['path'], item['signedURL'], SIGNED_URL_EXPIRES_IN)
+
+        except Exception as e:
+            st.error(f"Failed to get video URLs: {str(e)}")
+
+    return urls
+
+@timed_stage('sign_video_urls')
+def _sign_video_urls(file_paths):
+    """Sign file_paths with one storage call"""
+    supabase = init_supabase()
+    return supabase.storage.from_('videos').create_signed_urls(
+        paths=file_paths,
+        expires_in=SIGNED_URL_EXPIRES_IN
+    )
 
 def delete_video_from_storage(file_path):
     """Delete video file from Supabase Storage"""
@@ -61,16 +486,156 @@ def delete_video_from_storage(file_path):
         supabase = init_supabase()
 
         result = supabase.storage.from_('videos').remove([file_path])
+        # Videos are stored as {user_id}/{filename}
+        invalidate_queries(file_path.split('/')[0])
         return bool(result)
 
     except Exception as e:
+        print(f"Video delete error: {e}")
         st.error(f"Failed to delete video: {str(e)}")
         return False
 
+# Resumable uploads
+# Videos larger than one part are sent through Supabase Storage's TUS endpoint
+# in UPLOAD_PART_SIZE chunks, so an upload holds about one part in memory and a
+# dropped connection resumes from the last offset the server acknowledged.
+# Supabase requires parts of one upload to be sent in order, so parallelism is
+# bounded process-wide: at most UPLOAD_MAX_PARALLEL_PARTS parts are in flight
+# across all concurrent uploads.
+
+UPLOAD_PART_SIZE = int(os.getenv("UPLOAD_PART_SIZE_MB", "6")) * 1024 * 1024  # Supabase expects 6MB parts
+UPLOAD_MAX_PARALLEL_PARTS = int(os.getenv("UPLOAD_MAX_PARALLEL_PARTS", "4"))
+UPLOAD_RETRIES = 3
+
+@st.cache_resource
+def get_upload_state():
+    """Process-wide part slots"""
+    return {
+        'slots': threading.BoundedSemaphore(UPLOAD_MAX_PARALLEL_PARTS)
+    }
+
+def _tus_headers(supabase, extra=None):
+    """TUS protocol headers authenticated as the client's current user"""
+    anon_key = os.getenv("SUPABASE_ANON_KEY")
+    session = supabase.auth.get_session()
+    headers = {
+        'Authorization': f"Bearer {session.access_token if session else anon_key}",
+        'apikey': anon_key,
+        'Tus-Resumable': '1.0.0'
+    }
+    headers.update(extra or {})
+    return headers
+
+def _create_resumable_upload(supabase, file_path, size, content_type):
+    """Start a TUS upload into the videos bucket; returns the upload URL"""
+    endpoint = f"{os.getenv('SUPABASE_URL')}/storage/v1/upload/resumable"
+    metadata = {
+        'bucketName': 'videos',
+        'objectName': file_path,
+        'contentType': content_type or 'application/octet-stream'
+    }
+    encoded = ','.join(f"{name} {base64.b64encode(value.encode()).decode()}" for name, value in metadata.items())
+
+    response = get_supabase_http_client().post(endpoint, headers=_tus_headers(supabase, {
+        'Upload-Length': str(size),
+        'Upload-Metadata': encoded,
+        'x-upsert': 'true'
+    }))
+    response.raise_for_status()
+    return urljoin(endpoint, response.headers['Location'])
+
+def _get_upload_offset(supabase, upload_url):
+    """Bytes the server has acknowledged for upload_url, or None if the upload is gone"""
+    response = get_supabase_http_client().head(upload_url, headers=_tus_headers(supabase))
+    if response.status_code in (404, 410):
+        return None
+    response.raise_for_status()
+    return int(response.headers['Upload-Offset'])
+
+def upload_video_resumable(supabase, video, file_path, size, content_type):
+    """Upload a VideoBuffer in parts, resuming after a failed part from the server's offset"""
+    import httpx
+
+    state = get_upload_state()
+    # Every upload has its own file_path, so there is never an earlier upload to resume
+    upload_url = _create_resumable_upload(supabase, file_path, size, content_type)
+    offset = 0
+
+    failures = 0
+    while offset < size:
+        part = video.read_part(offset, UPLOAD_PART_SIZE)
+        try:
+            with state['slots']:
+                response = get_supabase_http_client().patch(upload_url, content=part, headers=_tus_headers(supabase, {
+                    'Upload-Offset': str(offset),
+                    'Content-Type': 'application/offset+octet-stream'
+                }))
+            response.raise_for_status()
+            offset = int(response.headers['Upload-Offset'])
+            failures = 0
+        except httpx.HTTPError:
+            failures += 1
+            if failures > UPLOAD_RETRIES:
+                raise
+            time.sleep(2 ** (failures - 1))
+            # Resume from whatever the server acknowledged before the failure
+            offset = _get_upload_offset(supabase, upload_url)
+            if offset is None:
+                raise
+
 # Simplified session management - let Supabase handle persistence
 
-# Initialize Supabase client (removed cache to fix cross-browser session sharing)
+# Supabase client pool
+# The old st.cache_resource on init_supabase shared one authenticated client
+# across browsers. The pool lives in st.session_state instead and is keyed by
+# the access token, so a session only ever reuses a client holding its own
+# session. All clients share one process-wide HTTP connection pool.
+
+SUPABASE_POOL_KEY = '_supabase_pool'
+
+@st.cache_resource
+def get_supabase_http_client():
+    """Process-wide httpx connection pool shared by every Supabase client"""
+    import httpx
+
+    return httpx.Client(
+        timeout=httpx.Timeout(120.0, connect=10.0),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        follow_redirects=True
+    )
+
+def _get_supabase_pool():
+    """Per-session pool state: {'clients': {access_token: client}, 'hits': int, 'misses': int}"""
+    if SUPABASE_POOL_KEY not in st.session_state:
+        st.session_state[SUPABASE_POOL_KEY] = {'clients': {}, 'hits': 0, 'misses': 0}
+    return st.session_state[SUPABASE_POOL_KEY]
+
+def _pool_supabase_client(access_token, client):
+    """Make client the only pooled client for this session, keyed by access_token"""
+    pool = _get_supabase_pool()
+    pool['clients'] = {access_token: client}
+
+def clear_supabase_pool():
+    """Drop pooled clients for this session (on logout or invalid tokens)"""
+    _get_supabase_pool()['clients'] = {}
+
+def get_supabase_pool_stats():
+    """Hit/miss counters of this session's client pool"""
+    pool = _get_supabase_pool()
+    return {'hits': pool['hits'], 'misses': pool['misses'], 'clients': len(pool['clients'])}
+
+def _create_supabase_client(url, key):
+    """Create a Supabase client on the shared HTTP connection pool"""
+    from supabase import create_client, ClientOptions
+
+    return create_client(url, key, options=ClientOptions(httpx_client=get_supabase_http_client()))
+
 def init_supabase():
+    # Background jobs run without session state - use the client bound to the worker thread
+    worker_client = getattr(_worker_state, 'supabase', None)
+    if worker_client is not None:
+        return worker_client
+
     url = os.getenv("SUPABASE_URL")
     key = os.getenv("SUPABASE_ANON_KEY")
 
@@ -78,23 +643,123 @@ def init_supabase():
         st.error("Missing Supabase credentials. Please set SUPABASE_URL and SUPABASE_ANON_KEY in your secrets.")
         st.stop()
 
-    client = create_client(url, key)
+    pool = _get_supabase_pool()
+    access_token = st.session_state.get('access_token') if 'refresh_token' in st.session_state else None
+
+    client = pool['clients'].get(access_token)
+    if client is not None:
+        pool['hits'] += 1
+        return client
+
+    pool['misses'] += 1
+    client = _create_supabase_client(url, key)
 
     # Restore session for logged-in users so RLS works properly
-    if 'access_token' in st.session_state and 'refresh_token' in st.session_state:
+    if access_token:
         try:
-            client.auth.set_session(
+            response = client.auth.set_session(
                 st.session_state.access_token,
                 st.session_state.refresh_token
             )
+            # set_session refreshes expired tokens - keep session state in sync
+            if response and response.session:
+                st.session_state.access_token = response.session.access_token
+                st.session_state.refresh_token = response.session.refresh_token
+                access_token = response.session.access_token
         except Exception as e:
             # Clear invalid tokens if session restore fails
             for key in ['access_token', 'refresh_token']:
                 if key in st.session_state:
                     del st.session_state[key]
+            access_token = None
 
+    _pool_supabase_client(access_token, client)
     return client
 
+@st.cache_resource
+def init_admin_supabase():
+    """Service role client for admin queries (bypasses RLS), or None if not configured
+
+    Safe to share across sessions: it never signs in, so it holds no user session.
+    """
+    service_role_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    if not service_role_key:
+        return None
+    return _create_supabase_client(os.getenv("SUPABASE_URL"), service_role_key)
+
+# Query cache
+# Every widget interaction reruns the script, and with it every read below.
+# Reads wrapped in @cached_query are kept for a TTL, keyed by the signed-in
+# user and role, and dropped as soon as this app writes to what they read
+# (invalidate_queries). Each invalidation bumps a generation counter that is
+# part of the key, so stale entries are simply never looked up again.
+
+QUERY_CACHE_SIZE = 512
+# Writes through this app invalidate immediately; the TTLs only bound how long
+# writes made elsewhere (another app instance, the Supabase dashboard) go unseen
+PLATFORM_QUERY_TTL = 60
+USER_QUERY_TTL = 300
+
+@st.cache_resource
+def get_query_cache():
+    """Process-wide read cache: {'lru': TTLCache, 'generations': {tag: int}, 'stats': {name: counters}, 'lock': Lock}"""
+    return {'lru': TTLCache(QUERY_CACHE_SIZE), 'generations': {}, 'stats': {}, 'lock': threading.Lock()}
+
+def cached_query(ttl, per_user=False):
+    """Cache a read's result for ttl seconds, per signed-in user and role
+
+    per_user: the first argument is the user_id whose rows are read, and the
+    entries are dropped by invalidate_queries(user_id). Otherwise the read is
+    platform-wide and dropped by any write. Must be called from the script
+    thread. Results are shared between reruns, so callers must not modify them.
+    """
+    def decorator(func):
+        name = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            cache = get_query_cache()
+            tag = f"user:{args[0]}" if per_user else 'platform'
+            with cache['lock']:
+                generation = cache['generations'].get(tag, 0)
+                stats = cache['stats'].setdefault(name, {'hits': 0, 'misses': 0})
+
+            key = (name, tag, generation, st.session_state.get('user_id'),
+                   st.session_state.get('is_admin', False), args)
+            result = cache['lru'].get(key)
+            if result is not None:
+                with cache['lock']:
+                    stats['hits'] += 1
+                return result
+
+            with cache['lock']:
+                stats['misses'] += 1
+            result = func(*args)
+            cache['lru'].put(key, result, ttl)
+            return result
+
+        return wrapper
+    return decorator
+
+def invalidate_queries(user_id=None):
+    """Drop cached reads a write made stale: every platform-wide read, plus user_id's own"""
+    cache = get_query_cache()
+    tags = ['platform'] + ([f"user:{user_id}"] if user_id else [])
+    with cache['lock']:
+        for tag in tags:
+            cache['generations'][tag] = cache['generations'].get(tag, 0) + 1
+
+def get_query_cache_stats():
+    """Hits and misses per cached function, for the admin dashboard"""
+    import pandas as pd
+
+    cache = get_query_cache()
+    with cache['lock']:
+        rows = [{'function': name, **counters} for name, counters in sorted(cache['stats'].items())]
+    stats = pd.DataFrame(rows, columns=['function', 'hits', 'misses'])
+    stats['hit_rate'] = stats['hits'] / (stats['hits'] + stats['misses']).clip(lower=1)
+    return stats
+
 # Supabase database functions
 
 def init_supabase_tables():
@@ -138,85 +803,70 @@ def init_supabase_tables():
     """
     pass  # Tables should be created via Supabase dashboard/SQL editor
 
+# Upload trend windows (days) offered on the admin dashboard. Counts come from
+# the daily_upload_counts rollup (SUPABASE_SETUP.md 2h), one row per day of the
+# window with zero-upload days filled in, so a window costs the same to draw
+# however many videos exist.
+UPLOAD_TREND_WINDOWS = [7, 30, 90, 365]
+
 def get_user_stats():
-    """Get user statistics from Supabase with error handling - Admin function bypasses RLS"""
+    """Get user statistics from Supabase with error handling - Admin function bypasses RLS
+
+    Counting happens in the database (see the admin_* functions in SUPABASE_SETUP.md),
+    so only small result sets come back however large the videos table grows.
+    """
+    import pandas as pd
+
     try:
-        # Initialize Supabase with service role key for admin queries
-        service_role_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-        if service_role_key:
-            # Use service role to bypass RLS for admin dashboard
-            url = os.getenv("SUPABASE_URL")
-            admin_supabase = create_client(url, service_role_key)
-
-            # Total users - bypass RLS
-            profiles_response = admin_supabase.table('profiles').select('id,username,is_admin').execute()
-            total_users = len(profiles_response.data) if profiles_response.data else 0
-
-            # Total videos - bypass RLS
-            videos_response = admin_supabase.table('videos').select('id,user_id,upload_date').execute()
-            total_videos = len(videos_response.data) if videos_response.data else 0
-        else:
+        # Use service role client for admin queries
+        use_service_role = init_admin_supabase() is not None
+        if not use_service_role:
             # Fallback to regular client (RLS-protected)
             st.warning("Service role key not configured - admin dashboard showing limited data")
-            supabase = init_supabase()
 
-            profiles_response = supabase.table('profiles').select('id,username,is_admin').execute()
-            total_users = len(profiles_response.data) if profiles_response.data else 0
-
-            videos_response = supabase.table('videos').select('id,user_id,upload_date').execute()
-            total_videos = len(videos_response.data) if videos_response.data else 0
-
-        # Videos per user - optimize by using the data we already have
-        videos_per_user_data = []
-        video_counts = {}
-
-        # Count videos by user_id
-        if videos_response.data:
-            for video in videos_response.data:
-                user_id = video['user_id']
-                video_counts[user_id] = video_counts.get(user_id, 0) + 1
-
-        # Match with profiles
-        if profiles_response.data:
-            for profile in profiles_response.data:
-                video_count = video_counts.get(profile['id'], 0)
-                videos_per_user_data.append({
-                    'username': profile['username'],
-                    'video_count': video_count,
-                    'is_admin': profile['is_admin']
-                })
-
-        videos_per_user = pd.DataFrame(videos_per_user_data) if videos_per_user_data else pd.DataFrame()
-
-        # Upload trends (last 30 days)
-        upload_trends_data = []
-        if videos_response.data:
-            from collections import defaultdict
-            date_counts = defaultdict(int)
-
-            # Debug: Let's see what we're getting
-            for video in videos_response.data:
-                upload_date = video.get('upload_date')
-                if upload_date:
-                    # Handle both date strings and datetime objects
-                    if isinstance(upload_date, str):
-                        date_str = upload_date[:10]
-                    else:
-                        date_str = str(upload_date)[:10]
-                    date_counts[date_str] += 1
+        return _fetch_user_stats(use_service_role)
+
+    except Exception as e:
+        st.error(f"Error loading dashboard stats: {str(e)}")
+        # Return empty data if there's an error
+        return 0, 0, pd.DataFrame()
 
-            # Create the trends data
-            upload_trends_data = [{'date': date, 'uploads': count}
-                                 for date, count in sorted(date_counts.items(), reverse=True)[:30]]
+@cached_query(PLATFORM_QUERY_TTL)
+def _fetch_user_stats(use_service_role):
+    import pandas as pd
 
-        upload_trends = pd.DataFrame(upload_trends_data)
+    # Service role bypasses RLS for the admin dashboard
+    supabase = init_admin_supabase() if use_service_role else init_supabase()
 
-        return total_users, total_videos, videos_per_user, upload_trends
+    # Total users and videos
+    totals = supabase.rpc('admin_dashboard_totals').execute().data
+    total_users = totals[0]['total_users'] if totals else 0
+    total_videos = totals[0]['total_videos'] if totals else 0
 
+    # Videos per user
+    videos_per_user = pd.DataFrame(supabase.rpc('admin_videos_per_user').execute().data or [])
+
+    return total_users, total_videos, videos_per_user
+
+def get_upload_trends(days):
+    """Get daily upload counts for the last `days` days, including days without uploads"""
+    import pandas as pd
+
+    try:
+        return _fetch_upload_trends(init_admin_supabase() is not None, days)
     except Exception as e:
-        st.error(f"Error loading dashboard stats: {str(e)}")
-        # Return empty data if there's an error
-        return 0, 0, pd.DataFrame(), pd.DataFrame()
+        st.error(f"Error loading upload trends: {str(e)}")
+        return pd.DataFrame()
+
+@cached_query(PLATFORM_QUERY_TTL)
+def _fetch_upload_trends(use_service_role, days):
+    import pandas as pd
+
+    supabase = init_admin_supabase() if use_service_role else init_supabase()
+    trends = pd.DataFrame(supabase.rpc('admin_daily_uploads', {'days': days}).execute().data or [])
+    if not trends.empty:
+        trends['date'] = pd.to_datetime(trends['date'])
+    return trends
 
 def authenticate_user(email, password):
     """
@@ -258,6 +908,8 @@ def authenticate_user(email, password):
             if response.session:
                 st.session_state.access_token = response.session.access_token
                 st.session_state.refresh_token = response.session.refresh_token
+                # This client now holds the user's session - reuse it instead of calling set_session again
+                _pool_supabase_client(response.session.access_token, supabase)
 
             # Return success with proper user data
             return response.user.id, is_admin, username, None
@@ -297,6 +949,8 @@ def create_user(username, email, password):
         })
 
         if response.user:
+            # A new profile changes the admin dashboard's counts
+            invalidate_queries()
             return response.user.id, None
         else:
             return None, "Failed to create account - no user returned"
@@ -308,155 +962,787 @@ def create_user(username, email, password):
             return None, "Email already exists"
         return None, f"Error: {error_msg}"
 
-def save_analysis(user_id, filename, analysis_results, file_path=None):
-    """Save video analysis results to Supabase with optional video file path"""
-    supabase = init_supabase()
-
-    # Convert analysis_results to JSON if it's a string
-    if isinstance(analysis_results, str):
-        try:
-            analysis_results = json.loads(analysis_results.replace("'", '"'))
-        except:
-            analysis_results = {"raw": analysis_results}
+# Analysis records
+# videos.analysis_results holds an AnalysisRecord as native JSONB. Rows are
+# decoded and validated once with AnalysisRecord.from_dict(); older rows saved
+# as {"raw": "<str(dict)>"} are still readable.
+
+@dataclass(slots=True)
+class AnalysisRecord:
+    """Typed gait analysis results, as stored in videos.analysis_results"""
+    primary_gait: str = "Unknown"
+    classification: str = "Unknown"
+    confidence: float = 0.0
+    stride_length: float = 0.0
+    rhythm_score: float = 0.0
+    symmetry_score: float = 0.0
+    stride_variability: float = 0.0
+    knee_angle: float = 0.0
+    body_length_variation: float = 0.0
+    processing_time: float = 0.0
+    details: str = ""
+
+    @classmethod
+    def from_dict(cls, data):
+        """Validate and decode results; unknown keys are ignored, missing ones get defaults
+
+        Raises ValueError if a field has the wrong type or a legacy row can't be read.
+        """
+        if isinstance(data.get('raw'), str):
+            try:
+                data = ast.literal_eval(data['raw'])
+            except (ValueError, SyntaxError) as e:
+                raise ValueError(f"Unreadable legacy analysis results: {e}")
+            if not isinstance(data, dict):
+                raise ValueError("Legacy analysis results are not a dict")
+
+        values = {}
+        for field in fields(cls):
+            value = data.get(field.name)
+            if value is None:
+                continue
+            if field.type is float:
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    raise ValueError(f"{field.name} must be a number, got {value!r}")
+                value = float(value)
+            elif not isinstance(value, str):
+                raise ValueError(f"{field.name} must be a string, got {value!r}")
+            values[field.name] = value
+        return cls(**values)
+
+    def to_dict(self):
+        return asdict(self)
+
+ANALYSIS_FIELDS = [field.name for field in fields(AnalysisRecord)]
+
+def analysis_frame(records):
+    """One columnar DataFrame of analysis fields; None records become empty rows"""
+    import pandas as pd
+
+    return pd.DataFrame({
+        name: [getattr(record, name) if record is not None else None for record in records]
+        for name in ANALYSIS_FIELDS
+    })
+
+def _analysis_row(user_id, filename, analysis_results, file_path=None, content_hash=None):
+    """Build a videos row from analysis results (a dict or AnalysisRecord)"""
+    if isinstance(analysis_results, dict):
+        analysis_results = AnalysisRecord.from_dict(analysis_results)
 
     data = {
         'user_id': user_id,
         'filename': filename,
-        'analysis_results': analysis_results
+        'analysis_results': analysis_results.to_dict()
     }
 
     # Add file path if video was uploaded to storage
     if file_path:
         data['file_path'] = file_path
 
-    supabase.table('videos').insert(data).execute()
+    # Content hash lets later uploads of the same clip reuse these results
+    if content_hash:
+        data['content_hash'] = content_hash
+        data['analyzer_version'] = ANALYZER_VERSION
+
+    return data
 
-def get_user_videos(user_id):
-    """Get videos for a specific user from Supabase using properly authenticated client"""
+@timed_stage('save_analysis')
+def save_analysis(user_id, filename, analysis_results, file_path=None, content_hash=None):
+    """Save video analysis results to Supabase with optional video file path and content hash"""
     supabase = init_supabase()
 
-    response = supabase.table('videos').select('*').eq('user_id', user_id).order('upload_date', desc=True).execute()
-
-    if response.data:
-        # Convert to DataFrame format expected by the UI
-        videos_data = []
-        for video in response.data:
-            videos_data.append({
-                'filename': video['filename'],
-                'upload_date': video['upload_date'],
-                'file_path': video.get('file_path'),  # Include file path for video playback
-                'analysis_results': json.dumps(video['analysis_results']) if isinstance(video['analysis_results'], dict) else str(video['analysis_results'])
-            })
-        return pd.DataFrame(videos_data)
-    else:
+    supabase.table('videos').insert(
+        _analysis_row(user_id, filename, analysis_results, file_path, content_hash)
+    ).execute()
+    invalidate_queries(user_id)
+
+@timed_stage('save_analyses')
+def save_analyses(rows):
+    """Save many videos rows (from _analysis_row) with one bulk insert"""
+    if not rows:
+        return
+    supabase = init_supabase()
+    supabase.table('videos').insert(rows).execute()
+    for user_id in {row['user_id'] for row in rows}:
+        invalidate_queries(user_id)
+
+VIDEO_PAGE_SIZES = [10, 25, 50, 100]
+
+# My Videos only shows these results - they are read straight out of the JSONB column
+VIDEO_SUMMARY_FIELDS = ['primary_gait', 'confidence', 'stride_length', 'rhythm_score', 'symmetry_score']
+VIDEO_LIST_COLUMNS = ','.join(
+    ['id', 'filename', 'upload_date', 'file_path']
+    + [f"{name}:analysis_results->{name}" for name in VIDEO_SUMMARY_FIELDS]
+    + ['raw:analysis_results->>raw']  # Only set on legacy rows
+)
+
+@cached_query(USER_QUERY_TTL, per_user=True)
+@timed_stage('get_user_videos')  # Inside the cache, so only database round trips are timed
+def get_user_videos(user_id, page_size=25, before=None):
+    """Get one page of a user's videos, newest first, using properly authenticated client
+
+    Uses keyset pagination on (upload_date, id): before is the cursor of the last
+    video on the previous page. Only the list columns and the summary results are
+    fetched, never the whole analysis_results document.
+    Returns (DataFrame, cursor for the next page or None, total video count).
+    The DataFrame has one column per analysis field plus has_results (False if
+    the stored results failed validation).
+    The total is only counted on the first page (None otherwise) - the count
+    would include the cursor filter on later pages.
+    """
+    import pandas as pd
+
+    supabase = init_supabase()
+
+    query = supabase.table('videos').select(VIDEO_LIST_COLUMNS,
+                                            count=None if before else 'exact').eq('user_id', user_id)
+    if before:
+        upload_date, video_id = before
+        query = query.or_(f'upload_date.lt."{upload_date}",and(upload_date.eq."{upload_date}",id.lt.{video_id})')
+
+    # One extra row tells us whether there is a next page
+    response = query.order('upload_date', desc=True).order('id', desc=True).limit(page_size + 1).execute()
+
+    videos = response.data or []
+    next_cursor = None
+    if len(videos) > page_size:
+        videos = videos[:page_size]
+        next_cursor = (videos[-1]['upload_date'], videos[-1]['id'])
+    total = None if before else (response.count or len(videos))
+
+    if not videos:
+        return pd.DataFrame(), next_cursor, total
+
+    return _video_frame(videos), next_cursor, total
+
+def _video_frame(videos):
+    """Decode each videos row once, then build one columnar frame of them"""
+    import pandas as pd
+
+    records = []
+    for video in videos:
+        try:
+            records.append(AnalysisRecord.from_dict(video))
+        except ValueError:
+            records.append(None)
+
+    return pd.DataFrame({
+        'id': [video['id'] for video in videos],
+        'filename': [video['filename'] for video in videos],
+        'upload_date': [video['upload_date'] for video in videos],
+        'file_path': [video.get('file_path') for video in videos],
+        'has_results': [record is not None for record in records]
+    }).join(analysis_frame(records))
+
+# Video comparison
+COMPARE_MAX_VIDEOS = 4
+VIDEO_COMPARE_COLUMNS = ','.join(
+    ['id', 'filename', 'upload_date', 'file_path']
+    + [f"{name}:analysis_results->{name}" for name in ANALYSIS_FIELDS]
+    + ['raw:analysis_results->>raw']
+)
+
+@cached_query(USER_QUERY_TTL, per_user=True)
+def get_videos_for_comparison(user_id, video_ids):
+    """Get the given videos with all their results in one query, oldest first"""
+    import pandas as pd
+
+    if not video_ids:
+        return pd.DataFrame()
+
+    supabase = init_supabase()
+    response = supabase.table('videos').select(VIDEO_COMPARE_COLUMNS).eq('user_id', user_id).in_(
+        'id', list(video_ids)
+    ).order('upload_date').order('id').execute()
+
+    if not response.data:
         return pd.DataFrame()
+    return _video_frame(response.data)
+
+# Metric trends
+# The whole history is fetched as one columnar JSON object (one array per
+# metric, see user_metric_history in SUPABASE_SETUP.md) and every statistic is
+# computed with vectorized pandas operations. Only the most recent
+# TREND_MAX_POINTS analyses are used, which keeps the cost bounded however
+# many videos a user has.
+
+TREND_METRICS = ['rhythm_score', 'symmetry_score', 'stride_variability', 'knee_angle', 'body_length_variation']
+TREND_MAX_POINTS = 5000
+TREND_WINDOW = 5
+# A change point is where the mean of the next TREND_WINDOW analyses differs from
+# the mean of the previous TREND_WINDOW by more than this many standard deviations
+TREND_CHANGE_THRESHOLD = 1.5
+TREND_LATENCY_BUDGET = 0.5  # seconds, fetch + compute
+
+@cached_query(USER_QUERY_TTL, per_user=True)
+def get_user_metric_history(user_id, max_points=TREND_MAX_POINTS):
+    """Get the user's analysis metrics over time as one DataFrame, oldest first
+
+    Values that aren't numbers come back as NaN, as do rows saved before results
+    were stored as JSON ({"raw": ...}).
+    """
+    import pandas as pd
 
-def get_all_users():
-    """Get all users with video counts from Supabase with error handling - Admin function bypasses RLS"""
+    supabase = init_supabase()
+    history = supabase.rpc('user_metric_history', {
+        'target_user_id': user_id,
+        'max_points': max_points
+    }).execute().data or {}
+
+    frame = pd.DataFrame({
+        metric: pd.to_numeric(pd.Series(history.get(metric) or [], dtype=object), errors='coerce')
+        for metric in TREND_METRICS
+    })
+    frame.insert(0, 'upload_date', pd.to_datetime(pd.Series(history.get('upload_date') or [], dtype=object),
+                                                  format='ISO8601', utc=True))
+    return frame
+
+def compute_metric_trends(history, window=TREND_WINDOW, threshold=TREND_CHANGE_THRESHOLD):
+    """Rolling means and change-point flags for every trend metric
+
+    Returns history with a {metric}_mean (rolling mean over `window` analyses) and
+    a {metric}_change (True on the first analysis after a shift in level) column
+    per metric.
+    """
+    values = history[TREND_METRICS]
+
+    rolling_mean = values.rolling(window, min_periods=1).mean()
+    before = values.rolling(window, min_periods=window).mean()
+    after = values[::-1].rolling(window, min_periods=window).mean()[::-1].shift(-1)
+
+    # Shift in level relative to the metric's overall spread, kept only where
+    # it is the largest within a window so a single shift is flagged once
+    spread = values.std().replace(0, float('nan'))
+    score = (after - before).abs() / spread
+    local_max = score.rolling(2 * window + 1, center=True, min_periods=1).max()
+    change = ((score > threshold) & (score == local_max)).shift(1, fill_value=False)
+
+    trends = history.copy()
+    for metric in TREND_METRICS:
+        trends[f'{metric}_mean'] = rolling_mean[metric]
+        trends[f'{metric}_change'] = change[metric].astype(bool)
+    return trends
+
+def get_metric_trends(user_id):
+    """Fetch and compute the user's metric trends, or None if they couldn't be loaded"""
+    started = time.perf_counter()
     try:
-        # Initialize Supabase with service role key for admin queries
-        service_role_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-        if service_role_key:
-            # Use service role to bypass RLS for admin user management
-            url = os.getenv("SUPABASE_URL")
-            admin_supabase = create_client(url, service_role_key)
+        trends = compute_metric_trends(get_user_metric_history(user_id))
+    except Exception as e:
+        st.error(f"Error loading trends: {str(e)}")
+        return None
 
-            # Get all profiles - bypass RLS
-            profiles_response = admin_supabase.table('profiles').select('id,username,created_at,is_admin').order('created_at', desc=True).execute()
+    elapsed = time.perf_counter() - started
+    if elapsed > TREND_LATENCY_BUDGET:
+        print(f"Metric trends took {elapsed:.2f}s for {len(trends)} analyses "
+              f"(budget {TREND_LATENCY_BUDGET}s)")
+    return trends
+
+# Analysis history export
+# An export pages through videos in id order (keyset, EXPORT_PAGE_SIZE rows per
+# request) and appends each page to a temp file as CSV or Parquet, so only one
+# page of rows is in memory while it is written, however large the export is.
+# The download is not bounded: st.download_button only serves data held in
+# memory, so the finished file is read back whole (Parquet is several times
+# smaller than CSV). Parquet needs pyarrow and is only offered when it is
+# installed.
+
+EXPORT_PAGE_SIZE = 1000
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+EXPORT_FORMAT_MODULES = {'Parquet': 'pyarrow'}
+EXPORT_COLUMNS = ['id', 'user_id', 'username', 'filename', 'upload_date', 'file_path', 'has_results'] + ANALYSIS_FIELDS
+EXPORT_SELECT = VIDEO_COMPARE_COLUMNS + ',user_id'
+# Usernames are looked up per page for just that page's users, this many ids per
+# request so the in.(...) filter stays well inside URL length limits
+EXPORT_USERNAME_BATCH = 100
+
+def get_export_client():
+    """Service role client if configured (every user's videos), else the session's own client"""
+    admin_supabase = init_admin_supabase()
+    if admin_supabase:
+        return admin_supabase
+    st.warning("Service role key not configured - export only includes videos you can see")
+    return init_supabase()
+
+def iter_video_pages(supabase, user_id=None, page_size=EXPORT_PAGE_SIZE):
+    """Yield the videos table (or one user's videos) one page of rows at a time, in id order"""
+    last_id = None
+    while True:
+        query = supabase.table('videos').select(EXPORT_SELECT)
+        if user_id:
+            query = query.eq('user_id', user_id)
+        if last_id is not None:
+            query = query.gt('id', last_id)
+        rows = query.order('id').limit(page_size).execute().data or []
+
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]['id']
+
+def _lookup_usernames(supabase, user_ids, usernames):
+    """Add the usernames of user_ids not already in usernames (id -> username)"""
+    missing = sorted({user_id for user_id in user_ids if user_id and user_id not in usernames})
+    for start in range(0, len(missing), EXPORT_USERNAME_BATCH):
+        batch = missing[start:start + EXPORT_USERNAME_BATCH]
+        profiles = supabase.table('profiles').select('id,username').in_('id', batch).execute().data or []
+        usernames.update({profile['id']: profile['username'] for profile in profiles})
+        # Users without a visible profile are not looked up again
+        usernames.update({user_id: None for user_id in batch if user_id not in usernames})
+
+def _export_schema():
+    import pyarrow as pa
+
+    types = {'id': pa.int64(), 'has_results': pa.bool_()}
+    types.update({field.name: pa.float64() if field.type is float else pa.string()
+                  for field in fields(AnalysisRecord)})
+    return pa.schema([(column, types.get(column, pa.string())) for column in EXPORT_COLUMNS])
+
+def export_analysis_history(supabase, file_format, user_id=None):
+    """Write the analysis history to a temp file and return its path
+
+    One row per video, with every analysis field as its own column. The caller
+    deletes the file.
+    """
+    import pandas as pd
 
-            if not profiles_response.data:
-                return pd.DataFrame()
+    usernames = {}
+    extension = EXPORT_FORMATS[file_format][0]
+    fd, path = tempfile.mkstemp(prefix='tru-stride-export-', suffix=f'.{extension}')
 
-            # Get all videos - bypass RLS
-            videos_response = admin_supabase.table('videos').select('id,user_id').execute()
-        else:
+    writer = None
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if file_format == 'Parquet':
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                schema = _export_schema()
+                writer = pq.ParquetWriter(f, schema)
+
+            header = True
+            for rows in iter_video_pages(supabase, user_id):
+                frame = _video_frame(rows)
+                frame['user_id'] = [row['user_id'] for row in rows]
+                _lookup_usernames(supabase, frame['user_id'], usernames)
+                frame['username'] = frame['user_id'].map(usernames)
+                frame = frame[EXPORT_COLUMNS]
+
+                if writer is not None:
+                    writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+                else:
+                    frame.to_csv(f, header=header, index=False)
+                    header = False
+
+            if writer is not None:
+                writer.close()
+            elif header:
+                # No videos - still write the header
+                pd.DataFrame(columns=EXPORT_COLUMNS).to_csv(f, index=False)
+    except Exception:
+        _remove_file(path)
+        raise
+    return path
+
+def available_export_formats():
+    """Export formats whose writer is installed, without importing it"""
+    from importlib.util import find_spec
+
+    return [file_format for file_format in EXPORT_FORMATS
+            if file_format not in EXPORT_FORMAT_MODULES or find_spec(EXPORT_FORMAT_MODULES[file_format])]
+
+def read_export(path):
+    """Contents of a finished export, read whole for st.download_button; the file is removed afterwards"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    finally:
+        _remove_file(path)
+
+# User management
+# Users are listed a page at a time, newest first, with keyset pagination on
+# (created_at, id) and an optional username search - filtering, paging and
+# video counts all happen in the database (admin_users_page in
+# SUPABASE_SETUP.md).
+
+USER_PAGE_SIZES = [25, 50, 100]
+
+def _like_pattern(search):
+    """ILIKE pattern matching search anywhere, with its wildcards escaped"""
+    escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+def get_users_page(search=None, page_size=25, after=None):
+    """Get one page of users (with video counts) matching search, plus the user counts
+
+    after is the (created_at, id) cursor of the last user on the previous page.
+    Returns (DataFrame, cursor for the next page or None, counts) where counts has
+    matching_users, admin_users and total_users.
+    """
+    import pandas as pd
+
+    try:
+        # Use service role client for admin queries
+        use_service_role = init_admin_supabase() is not None
+        if not use_service_role:
             # Fallback to regular client (RLS-protected) with warning
             st.warning("Service role key not configured - user management showing limited data")
-            supabase = init_supabase()
-            profiles_response = supabase.table('profiles').select('id,username,created_at,is_admin').order('created_at', desc=True).execute()
 
-            if not profiles_response.data:
-                return pd.DataFrame()
+        return _fetch_users_page(use_service_role, search or None, page_size, after)
+
+    except Exception as e:
+        st.error(f"Error loading users: {str(e)}")
+        return pd.DataFrame(), None, {'matching_users': 0, 'admin_users': 0, 'total_users': 0}
+
+@cached_query(PLATFORM_QUERY_TTL)
+def _fetch_users_page(use_service_role, search, page_size, after):
+    import pandas as pd
 
-            videos_response = supabase.table('videos').select('id,user_id').execute()
+    # Service role bypasses RLS for admin user management
+    supabase = init_admin_supabase() if use_service_role else init_supabase()
+    pattern = _like_pattern(search) if search else None
 
-        # Count videos by user_id
-        video_counts = {}
-        if videos_response.data:
-            for video in videos_response.data:
-                user_id = video['user_id']
-                video_counts[user_id] = video_counts.get(user_id, 0) + 1
+    params = {'pattern': pattern, 'page_size': page_size}
+    if after:
+        params['after_created_at'], params['after_id'] = after
+    users = supabase.rpc('admin_users_page', params).execute().data or []
 
-        # Build user data with video counts
-        users_data = []
-        for profile in profiles_response.data:
-            video_count = video_counts.get(profile['id'], 0)
+    # The function returns one extra row when there is a next page
+    next_cursor = None
+    if len(users) > page_size:
+        users = users[:page_size]
+        next_cursor = (users[-1]['created_at'], users[-1]['id'])
 
-            users_data.append({
-                'id': profile['id'],
-                'username': profile['username'],
-                'email': f"{profile['username']}@example.com",  # Placeholder
-                'created_at': profile['created_at'],
-                'is_admin': profile['is_admin'],
-                'video_count': video_count
-            })
+    counts = supabase.rpc('admin_user_counts', {'pattern': pattern}).execute().data
+    counts = counts[0] if counts else {'matching_users': len(users), 'admin_users': 0, 'total_users': len(users)}
 
-        return pd.DataFrame(users_data)
+    columns = ['id', 'username', 'created_at', 'is_admin', 'video_count']
+    return pd.DataFrame(users, columns=columns), next_cursor, counts
 
+def set_admin_statuses(changes):
+    """Promote and demote many users with one profiles update
+
+    changes maps user_id to whether they should be an admin.
+    """
+    if not changes:
+        return
+    # Same client as the user list: service role if configured
+    supabase = init_admin_supabase() or init_supabase()
+
+    supabase.rpc('admin_set_admin_status', {
+        'promote': [user_id for user_id, make_admin in changes.items() if make_admin],
+        'demote': [user_id for user_id, make_admin in changes.items() if not make_admin]
+    }).execute()
+    for user_id in changes:
+        invalidate_queries(user_id)
+
+# Analysis result cache
+# Results are keyed by the SHA-256 of the video bytes plus ANALYZER_VERSION,
+# so re-uploading the same clip skips the Gradio round-trip. Bump
+# ANALYZER_VERSION whenever the space's model or output format changes.
+
+ANALYZER_SPACE = "judytuna/tru-stride-analyzer"
+ANALYZER_VERSION = "1"
+HASH_CHUNK_SIZE = 1024 * 1024
+ANALYSIS_CACHE_SIZE = 256
+
+class LRUCache:
+    """Thread-safe bounded LRU mapping with hit/miss counters"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+class TTLCache(LRUCache):
+    """LRUCache whose entries expire; entries within refresh_margin seconds of expiry count as misses"""
+
+    def __init__(self, max_entries, refresh_margin=0):
+        super().__init__(max_entries)
+        self.refresh_margin = refresh_margin
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] - self.refresh_margin <= time.time():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, ttl):
+        super().put(key, (value, time.time() + ttl))
+
+@st.cache_resource
+def get_analysis_cache():
+    """Process-wide analysis cache: {'lru': LRUCache, 'db_hits': int, 'saved_seconds': float, 'lock': Lock}"""
+    return {'lru': LRUCache(ANALYSIS_CACHE_SIZE), 'db_hits': 0, 'saved_seconds': 0.0, 'lock': threading.Lock()}
+
+def get_analysis_cache_stats():
+    """Counters for the admin dashboard"""
+    cache = get_analysis_cache()
+    lru = cache['lru']
+    hits = lru.hits
+    lookups = lru.hits + lru.misses
+    return {
+        'entries': len(lru),
+        'memory_hits': hits,
+        'db_hits': cache['db_hits'],
+        'misses': lru.misses - cache['db_hits'],
+        'hit_rate': (hits + cache['db_hits']) / lookups if lookups else 0.0,
+        'saved_seconds': cache['saved_seconds']
+    }
+
+@timed_stage('hash_video')
+def hash_video(video):
+    """Streaming SHA-256 of a VideoBuffer, read through its own handle"""
+    digest = hashlib.sha256()
+    with video.open() as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def get_cached_analysis(content_hash):
+    """Look up results for content_hash in memory, then in the user's own videos rows"""
+    cache = get_analysis_cache()
+    key = (content_hash, ANALYZER_VERSION)
+
+    entry = cache['lru'].get(key)
+    if entry is not None:
+        with cache['lock']:
+            cache['saved_seconds'] += entry['seconds']
+        return dict(entry['results'])
+
+    try:
+        supabase = init_supabase()
+        response = supabase.table('videos').select('analysis_results').eq(
+            'content_hash', content_hash
+        ).eq('analyzer_version', ANALYZER_VERSION).limit(1).execute()
     except Exception as e:
-        st.error(f"Error loading users: {str(e)}")
-        return pd.DataFrame()
+        # Cache columns missing (migration not run) or network error - just analyze again
+        print(f"Analysis cache lookup error: {e}")
+        return None
 
-def toggle_admin_status(user_id, make_admin):
-    """Toggle admin status for a user in Supabase"""
-    supabase = init_supabase()
+    if response.data and isinstance(response.data[0].get('analysis_results'), dict):
+        try:
+            results = AnalysisRecord.from_dict(response.data[0]['analysis_results']).to_dict()
+        except ValueError:
+            return None
+        seconds = results.get('processing_time', 0.0) or 0.0
+        cache['lru'].put(key, {'results': results, 'seconds': seconds})
+        with cache['lock']:
+            cache['db_hits'] += 1
+            cache['saved_seconds'] += seconds
+        return dict(results)
+
+    return None
+
+def cache_analysis(content_hash, results, seconds):
+    """Remember successful results for content_hash; failures are never cached"""
+    if "error" in results:
+        return
+    get_analysis_cache()['lru'].put((content_hash, ANALYZER_VERSION), {'results': dict(results), 'seconds': seconds})
+
+# Shared Gradio client
+# Creating a Client fetches the space's config and API schema, and wakes the
+# space if it is asleep. One client is created lazily per process, shared by
+# all sessions and analysis workers, warmed in the background after the first
+# login and rebuilt only when a health check fails.
+# Connects and health checks run outside the state lock, one attempt at a time:
+# while a check runs, other callers keep using the current client, and only
+# callers with no client to use wait for a connect (at most
+# GRADIO_CONNECT_WAIT_SECONDS).
+
+GRADIO_HEALTH_CHECK_SECONDS = 300
+GRADIO_HEALTH_TIMEOUT = 10
+GRADIO_COLD_START_SECONDS = 15  # Connects slower than this mean the space was asleep
+GRADIO_CONNECT_WAIT_SECONDS = 300
+
+@st.cache_resource
+def get_gradio_state():
+    """Process-wide Gradio client with connect counters"""
+    return {
+        'client': None,
+        'checked_at': 0.0,
+        'connects': 0,
+        'cold_starts': 0,
+        'last_connect_seconds': None,
+        'attempt': None,  # Future of the connect or health check in progress
+        'lock': threading.Lock()
+    }
+
+def _connect_gradio(state):
+    """Build a new client; returns it once connected (the lock is not held)"""
+    from gradio_client import Client
+
+    started = time.perf_counter()
+    client = Client(ANALYZER_SPACE, verbose=False)
+    elapsed = time.perf_counter() - started
+
+    with state['lock']:
+        state['connects'] += 1
+        state['last_connect_seconds'] = elapsed
+        if elapsed > GRADIO_COLD_START_SECONDS:
+            state['cold_starts'] += 1
+    if elapsed > GRADIO_COLD_START_SECONDS:
+        print(f"Gradio cold start: {ANALYZER_SPACE} took {elapsed:.1f}s to connect")
+    else:
+        print(f"Gradio client connected to {ANALYZER_SPACE} in {elapsed:.1f}s")
+    return client
+
+def _gradio_healthy(client):
+    """Cheap ping of the space's config endpoint, bounded by GRADIO_HEALTH_TIMEOUT
+
+    Only the status line is read, so a slow body cannot stretch the check.
+    """
+    import httpx
+
+    try:
+        with httpx.stream("GET", urljoin(client.src, "config"), timeout=GRADIO_HEALTH_TIMEOUT) as response:
+            return response.status_code == 200
+    except httpx.HTTPError:
+        return False
+
+def _check_gradio_client(state, client):
+    """Health-check client, or connect if there is none; returns the client to use"""
+    if client is not None:
+        if _gradio_healthy(client):
+            return client
+        print(f"Gradio health check failed for {ANALYZER_SPACE} - reconnecting")
+        # Callers wait for the new client rather than use the failing one
+        with state['lock']:
+            state['client'] = None
+    return _connect_gradio(state)
+
+def get_gradio_client():
+    """Shared Gradio client, health-checked every GRADIO_HEALTH_CHECK_SECONDS"""
+    state = get_gradio_state()
+    with state['lock']:
+        client = state['client']
+        if client is not None and time.time() - state['checked_at'] <= GRADIO_HEALTH_CHECK_SECONDS:
+            return client
+        attempt = state['attempt']
+        if attempt is not None:
+            if client is not None:
+                # A check is already running - keep using the current client meanwhile
+                return client
+            return_when_ready = True
+        else:
+            attempt = state['attempt'] = Future()
+            return_when_ready = False
+    if return_when_ready:
+        # Another caller is connecting; wait for its client
+        return attempt.result(timeout=GRADIO_CONNECT_WAIT_SECONDS)
+
+    try:
+        client = _check_gradio_client(state, client)
+    except Exception as e:
+        with state['lock']:
+            state['attempt'] = None
+        attempt.set_exception(e)
+        raise
+    with state['lock']:
+        state['client'] = client
+        state['checked_at'] = time.time()
+        state['attempt'] = None
+    attempt.set_result(client)
+    return client
+
+def mark_gradio_client_suspect():
+    """Force a health check before the shared client is used again (e.g. after a failed call)"""
+    get_gradio_state()['checked_at'] = 0.0
+
+def _warm_gradio_client():
+    try:
+        get_gradio_client()
+    except Exception as e:
+        print(f"Gradio warm-up failed: {e}")
 
-    supabase.table('profiles').update({
-        'is_admin': make_admin
-    }).eq('id', user_id).execute()
+@st.cache_resource
+def start_gradio_warmup():
+    """Connect (and wake the space) in the background once per process"""
+    thread = threading.Thread(target=_warm_gradio_client, name='gradio-warmup', daemon=True)
+    thread.start()
+    return thread
 
-def analyze_gait(video_file):
+@timed_stage('analyze_gait')
+def analyze_gait(video, content_hash=None):
     """
-    Call your HuggingFace Gradio app for gait analysis
+    Call your HuggingFace Gradio app for gait analysis of a VideoBuffer
+    Results are reused when the same video (by content hash) was analyzed before.
     """
     try:
-        from gradio_client import Client
+        if content_hash is None:
+            content_hash = hash_video(video)
 
-        # Connect to your Gradio space
-        client = Client("judytuna/tru-stride-analyzer")
+        cached = get_cached_analysis(content_hash)
+        if cached is not None:
+            return cached
 
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp_file:
-            tmp_file.write(video_file.read())
-            tmp_file_path = tmp_file.name
+        started = time.perf_counter()
+
+        # Shared connection to your Gradio space
+        client = get_gradio_client()
 
         # Call your Gradio app using the correct endpoint
         # Use gradio_client.handle_file() to properly format the file
+        # The buffer is already on disk, so no temp copy is needed
         from gradio_client import handle_file
 
         result = client.predict(
-            handle_file(tmp_file_path),
+            handle_file(video.path),
             api_name="/process_video_upload"
         )
-
-        # Clean up temp file
-        os.unlink(tmp_file_path)
+        # Connecting plus inference; analyze_gait as a whole also covers cache hits and parsing
+        record_latency('gradio_inference', time.perf_counter() - started)
 
         # Parse the result from your Gradio app
         # You'll need to adjust this based on what your model returns
-        if isinstance(result, tuple):
-            # If your Gradio returns multiple outputs
-            analysis_text = result[0] if result else "No analysis available"
+        if isinstance(result, (tuple, list)):
+            # If your Gradio returns multiple outputs, prefer a JSON one
+            analysis_output = next((output for output in result if isinstance(output, dict)),
+                                   result[0] if result else "No analysis available")
         else:
-            analysis_text = str(result)
+            analysis_output = result
 
         # Parse your actual results into structured format
-        analysis = parse_gradio_results(analysis_text)
+        analysis = parse_gradio_results(analysis_output)
+
+        cache_analysis(content_hash, analysis, time.perf_counter() - started)
 
         return analysis
 
     except Exception as e:
-        st.error(f"Error analyzing video: {str(e)}")
+        mark_gradio_client_suspect()
+        print(f"Gait analysis error: {e}")
+        # On a worker thread the job records the error from the result below
+        if _on_script_thread():
+            st.error(f"Error analyzing video: {str(e)}")
         # Fallback to demo data if API fails
         return {
             "primary_gait": "Analysis Failed",
@@ -467,10 +1753,114 @@ def analyze_gait(video_file):
             "error": str(e)
         }
 
-def parse_gradio_results(analysis_text):
+# Gradio output parsing
+# One precompiled pattern pulls every labelled field out of the space's markdown
+# in a single pass. It matches the labels case-sensitively, which lets the regex
+# engine skip ahead to likely label starts; only if fields are missing is the
+# text searched again ignoring case. If the space returns a structured JSON
+# payload (a dict, or a JSON string) it is used directly instead.
+
+GRADIO_LABELS = {
+    'Classification': 'classification',
+    'Details': 'details',
+    'Confidence': 'confidence',
+    'Processing Time': 'processing_time',
+    'Stride Variability': 'stride_variability',
+    'Mean Knee Angle': 'knee_angle',
+    'Body Length Variation': 'body_length_variation',
+}
+GRADIO_FIELDS = list(GRADIO_LABELS.values())
+GRADIO_TEXT_FIELDS = {'classification', 'details'}
+GRADIO_METRIC_FIELDS = ['stride_variability', 'knee_angle', 'body_length_variation']
+GRADIO_LABELS_ANY_CASE = {label.lower(): field for label, field in GRADIO_LABELS.items()}
+
+# "**Confidence:** 95%", "**Confidence**: 95%", "- Mean Knee Angle: 66.0°", ...
+# Groups: label, value, the number the value starts with (if any), % after that number
+_GRADIO_NUMBER_SOURCE = r'([-+]?(?:\d+(?:\.\d*)?|\.\d+))[ \t]*(%)?'
+_GRADIO_FIELD_SOURCE = (
+    r'(' + '|'.join(GRADIO_LABELS) + r')'
+    r'[ \t]*(?:\*\*)?[ \t]*:[ \t]*(?:\*\*)?[ \t]*'
+    r'((?:' + _GRADIO_NUMBER_SOURCE + r')?[^\r\n]*)'
+)
+GRADIO_FIELD_PATTERN = re.compile(_GRADIO_FIELD_SOURCE)
+GRADIO_FIELD_PATTERN_ANY_CASE = re.compile(_GRADIO_FIELD_SOURCE, re.IGNORECASE)
+GRADIO_NUMBER_PATTERN = re.compile(_GRADIO_NUMBER_SOURCE)
+
+# JSON payload keys: our field names, plus the markdown labels in snake_case
+GRADIO_PAYLOAD_KEYS = {
+    **{field: field for field in GRADIO_FIELDS},
+    **{label.replace(' ', '_'): field for label, field in GRADIO_LABELS_ANY_CASE.items()},
+}
+
+def _gradio_number(field, number, percent=None):
+    """Float value of a numeric field; confidence is normalised to 0-1"""
+    number = float(number)
+    if field == 'confidence' and (percent or number > 1):
+        number /= 100.0
+    return number
+
+def _fields_from_text(text, pattern=GRADIO_FIELD_PATTERN, labels=GRADIO_LABELS, found=None):
+    found = {} if found is None else found
+    for label, value, number, percent in pattern.findall(text):
+        field = labels.get(label) or labels.get(label.lower())
+        if field in found:
+            continue
+        if field in GRADIO_TEXT_FIELDS:
+            value = value.strip(' \t*')
+            if value:
+                found[field] = value
+        elif number:
+            found[field] = _gradio_number(field, number, percent)
+        else:
+            # Something before the number ("~95%")
+            match = GRADIO_NUMBER_PATTERN.search(value)
+            if match:
+                found[field] = _gradio_number(field, *match.groups())
+
+    if len(found) < len(GRADIO_FIELDS) and pattern is GRADIO_FIELD_PATTERN:
+        # Labels in an unexpected case - look again for the missing fields only
+        return _fields_from_text(text, GRADIO_FIELD_PATTERN_ANY_CASE, GRADIO_LABELS_ANY_CASE, found)
+    return found
+
+def _fields_from_payload(payload):
+    # Accept flat payloads and one level of nesting ({"metrics": {...}})
+    items = list(payload.items())
+    for value in payload.values():
+        if isinstance(value, dict):
+            items.extend(value.items())
+
+    found = {}
+    for key, value in items:
+        field = GRADIO_PAYLOAD_KEYS.get(str(key).lower().replace(' ', '_'))
+        if field is None or field in found:
+            continue
+        if field in GRADIO_TEXT_FIELDS:
+            if isinstance(value, str) and value.strip():
+                found[field] = value.strip()
+        elif isinstance(value, str):
+            # "95%", "66.0°"
+            match = GRADIO_NUMBER_PATTERN.search(value)
+            if match:
+                found[field] = _gradio_number(field, *match.groups())
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            found[field] = _gradio_number(field, value)
+    return found
+
+def extract_gradio_fields(output):
+    """The raw fields found in a Gradio output; fields that weren't found are left out"""
+    if isinstance(output, str) and output.lstrip().startswith('{'):
+        try:
+            output = json.loads(output)
+        except ValueError:
+            pass
+    if isinstance(output, dict):
+        return _fields_from_payload(output)
+    return _fields_from_text(str(output))
+
+def parse_gradio_results(analysis_output):
     """
     Parse the stride analysis results from your Gradio app
-    Expected format:
+    Accepts a JSON payload (dict or string) with the fields below, or the markdown:
     ⚠️ **Stride Analysis Results**
     **Classification:** ABNORMAL
     **Confidence:** 95%
@@ -482,90 +1872,57 @@ def parse_gradio_results(analysis_text):
     - Body Length Variation: 0.749
     """
     try:
-        # Initialize defaults
-        analysis = {
-            "primary_gait": "Unknown",
-            "confidence": 0.0,
-            "stride_variability": 0.0,
-            "knee_angle": 0.0,
-            "body_length_variation": 0.0,
-            "processing_time": 0.0,
-            "classification": "Unknown",
-            "details": ""
-        }
+        analysis = extract_gradio_fields(analysis_output)
+
+        if not any(field in analysis for field in GRADIO_METRIC_FIELDS):
+            # An error message from the space ("No horse detected...", "Too few strides..."),
+            # not an analysis - scores would come out a perfect 10, so fail the job instead
+            # and nothing is saved or cached
+            message = ' '.join(str(analysis_output).replace('*', '').split())
+            return {
+                "primary_gait": "Analysis Failed",
+                "confidence": 0.0,
+                "stride_length": 0.0,
+                "rhythm_score": 0.0,
+                "symmetry_score": 0.0,
+                "error": f"No gait metrics in model output: {message[:300]}",
+                "raw_output": str(analysis_output)
+            }
+
+        if len(analysis) < len(GRADIO_FIELDS):
+            # Usually means the space's output format changed
+            missing = [field for field in GRADIO_FIELDS if field not in analysis]
+            print(f"Gradio output missing fields: {', '.join(missing)}")
 
-        # Parse the text line by line
-        lines = analysis_text.split('\n')
-
-        for line in lines:
-            line = line.strip()
-
-            # Extract Classification (NORMAL/ABNORMAL)
-            if "**Classification:**" in line:
-                classification = line.split("**Classification:**")[-1].strip()
-                analysis["classification"] = classification
-                # Map to gait terminology for dashboard
-                analysis["primary_gait"] = f"Stride: {classification}"
-
-            # Extract Confidence percentage
-            elif "**Confidence:**" in line:
-                confidence_str = line.split("**Confidence:**")[-1].strip()
-                # Remove % symbol and convert to decimal
-                confidence_num = re.findall(r'\d+', confidence_str)
-                if confidence_num:
-                    analysis["confidence"] = float(confidence_num[0]) / 100.0
-
-            # Extract Processing Time
-            elif "**Processing Time:**" in line:
-                time_str = line.split("**Processing Time:**")[-1].strip()
-                time_num = re.findall(r'[\d.]+', time_str)
-                if time_num:
-                    analysis["processing_time"] = float(time_num[0])
-
-            # Extract Details
-            elif "**Details:**" in line:
-                details = line.split("**Details:**")[-1].strip()
-                analysis["details"] = details
-
-            # Extract Metrics
-            elif "Stride Variability:" in line:
-                variability = re.findall(r'[\d.]+', line)
-                if variability:
-                    analysis["stride_variability"] = float(variability[0])
-
-            elif "Mean Knee Angle:" in line:
-                angle = re.findall(r'[\d.]+', line)
-                if angle:
-                    analysis["knee_angle"] = float(angle[0])
-
-            elif "Body Length Variation:" in line:
-                variation = re.findall(r'[\d.]+', line)
-                if variation:
-                    analysis["body_length_variation"] = float(variation[0])
+        classification = analysis.get("classification", "Unknown")
+        stride_variability = analysis.get("stride_variability", 0.0)
+        knee_angle = analysis.get("knee_angle", 0.0)
+        body_length_variation = analysis.get("body_length_variation", 0.0)
 
         # Calculate quality scores based on your metrics
         # Lower variability = better rhythm (inverted scale)
-        rhythm_score = max(0, 10 - (analysis["stride_variability"] * 10))
+        rhythm_score = max(0, 10 - (stride_variability * 10))
 
         # Body length variation - lower is better (inverted scale)
-        symmetry_score = max(0, 10 - (analysis["body_length_variation"] * 10))
+        symmetry_score = max(0, 10 - (body_length_variation * 10))
 
         # Use knee angle as stride length approximation (normalize to reasonable range)
-        stride_length = analysis["knee_angle"] / 30.0  # Rough conversion
+        stride_length = knee_angle / 30.0  # Rough conversion
 
         # Final formatted results
         return {
-            "primary_gait": analysis["primary_gait"],
-            "confidence": analysis["confidence"],
+            # Map to gait terminology for dashboard
+            "primary_gait": f"Stride: {classification}" if "classification" in analysis else "Unknown",
+            "confidence": analysis.get("confidence", 0.0),
             "stride_length": round(stride_length, 1),
             "rhythm_score": round(rhythm_score, 1),
             "symmetry_score": round(symmetry_score, 1),
-            "classification": analysis["classification"],
-            "stride_variability": analysis["stride_variability"],
-            "knee_angle": analysis["knee_angle"],
-            "body_length_variation": analysis["body_length_variation"],
-            "processing_time": analysis["processing_time"],
-            "details": analysis["details"]
+            "classification": classification,
+            "stride_variability": stride_variability,
+            "knee_angle": knee_angle,
+            "body_length_variation": body_length_variation,
+            "processing_time": analysis.get("processing_time", 0.0),
+            "details": analysis.get("details", "")
         }
 
     except Exception as e:
@@ -576,22 +1933,283 @@ def parse_gradio_results(analysis_text):
             "rhythm_score": 0.0,
             "symmetry_score": 0.0,
             "error": f"Parsing failed: {str(e)}",
-            "raw_output": analysis_text
+            "raw_output": str(analysis_output)
         }
 
+# Background analysis jobs
+# "Analyze Gait" queues a job on a process-wide worker pool instead of blocking
+# the script thread. The job analyzes, uploads and saves on its own, so results
+# are persisted even if the user switches tabs or closes the browser. Sessions
+# only hold the job id and poll for completion.
+
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))
+JOB_RETENTION_SECONDS = 3600
+JOB_POLL_SECONDS = 2
+BATCH_MAX_FILES = 50
+
+# Worker threads have no st.session_state - init_supabase() returns the client bound here instead
+_worker_state = threading.local()
+
+def _on_script_thread():
+    """Whether this thread runs a session's script - st.error etc. show nothing on worker threads"""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    return get_script_run_ctx(suppress_warning=True) is not None
+
+@st.cache_resource
+def get_job_manager():
+    """Process-wide worker pool and job registry shared by all sessions"""
+    return {
+        'executor': ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix='gait-analysis'),
+        # Separate pool so a job's upload never queues behind other jobs waiting on their uploads
+        'upload_executor': ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix='video-upload'),
+        'jobs': {},
+        'batches': {},
+        'lock': threading.Lock()
+    }
+
+def _purge_finished_jobs(manager):
+    """Forget finished jobs and batches older than JOB_RETENTION_SECONDS (caller holds the lock)
+
+    Jobs of a batch still running are kept: the batch saves their results when it finishes.
+    """
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    running_batches = {batch_id for batch_id, batch in manager['batches'].items() if batch['finished_at'] is None}
+    for registry in (manager['jobs'], manager['batches']):
+        for item_id in [item_id for item_id, item in registry.items()
+                        if item['finished_at'] and item['finished_at'] < cutoff
+                        and item.get('batch_id') not in running_batches]:
+            del registry[item_id]
+
+def _new_job(video, user_id, batch_id=None):
+    return {
+        'id': uuid.uuid4().hex,
+        'user_id': user_id,
+        'batch_id': batch_id,
+        'filename': video.name,
+        'status': 'queued',  # queued -> running -> done | failed
+        'submitted_at': time.time(),
+        'finished_at': None,
+        'results': None,
+        'file_path': None,
+        'content_hash': None,
+        'error': None,
+        'upload_error': None  # The analysis is still saved, without its video
+    }
+
+def _session_client():
+    """The submitting session's own client, which its jobs use so RLS still applies
+
+    Jobs share it rather than signing in a client of their own: Supabase rotates
+    the refresh token on every refresh, so only one client may refresh a session.
+    This one keeps refreshing it for as long as the session's jobs run.
+    """
+    return init_supabase()
+
+def submit_analysis_job(video, user_id):
+    """Queue analysis, upload and save of a VideoBuffer; returns the job id"""
+    manager = get_job_manager()
+    job = _new_job(video, user_id)
+    client = _session_client()
+
+    with manager['lock']:
+        _purge_finished_jobs(manager)
+        manager['jobs'][job['id']] = job
+
+    # The job holds its own reference, so the buffer outlives a new upload in this session
+    manager['executor'].submit(_run_analysis_job, job, video.acquire(), client)
+    return job['id']
+
+def get_analysis_job(job_id):
+    """Snapshot of a job, or None if unknown (e.g. the server restarted)"""
+    job = get_job_manager()['jobs'].get(job_id)
+    return dict(job) if job else None
+
+def get_active_analysis_jobs(user_id):
+    """Queued or running single-video jobs of a user, oldest first"""
+    jobs = list(get_job_manager()['jobs'].values())
+    return [dict(job) for job in sorted(jobs, key=lambda job: job['submitted_at'])
+            if job['user_id'] == user_id and job['batch_id'] is None and job['status'] in ('queued', 'running')]
+
+# Batch analysis
+# A batch runs its videos as ordinary jobs, at most `concurrency` at a time:
+# each finished job starts the next pending one. Jobs in a batch skip their own
+# save; the job that finishes last writes every successful result with one
+# bulk insert.
+
+def submit_analysis_batch(videos, user_id, concurrency):
+    """Queue a list of VideoBuffers (ownership passes to the batch); returns the batch id"""
+    manager = get_job_manager()
+    batch_id = uuid.uuid4().hex
+    jobs = [_new_job(video, user_id, batch_id) for video in videos]
+    batch = {
+        'id': batch_id,
+        'user_id': user_id,
+        'job_ids': [job['id'] for job in jobs],
+        'pending': list(zip(jobs, videos)),
+        'remaining': len(jobs),
+        'concurrency': max(1, min(concurrency, ANALYSIS_WORKERS)),
+        'status': 'running',  # running -> saving -> done | failed
+        'saved': 0,
+        'submitted_at': time.time(),
+        'finished_at': None,
+        'error': None
+    }
+    client = _session_client()
+
+    with manager['lock']:
+        _purge_finished_jobs(manager)
+        for job in jobs:
+            manager['jobs'][job['id']] = job
+        manager['batches'][batch_id] = batch
+        started = [batch['pending'].pop(0) for _ in range(min(batch['concurrency'], len(jobs)))]
+
+    for job, video in started:
+        manager['executor'].submit(_run_batch_job, batch, job, video, client)
+    return batch_id
+
+def get_analysis_batch(batch_id):
+    """Snapshot of a batch with its job snapshots, or None if unknown"""
+    manager = get_job_manager()
+    batch = manager['batches'].get(batch_id)
+    if batch is None:
+        return None
+    snapshot = {key: value for key, value in batch.items() if key != 'pending'}
+    snapshot['jobs'] = [dict(manager['jobs'][job_id]) for job_id in batch['job_ids'] if job_id in manager['jobs']]
+    return snapshot
+
+def get_active_analysis_batches(user_id):
+    """Unfinished batches of a user, oldest first"""
+    batches = list(get_job_manager()['batches'].values())
+    return [batch['id'] for batch in sorted(batches, key=lambda batch: batch['submitted_at'])
+            if batch['user_id'] == user_id and batch['finished_at'] is None]
+
+def _run_batch_job(batch, job, video, client):
+    """Worker: run one batch job, then start the next pending one or save the batch"""
+    _run_analysis_job(job, video, client, save=False)
+
+    manager = get_job_manager()
+    with manager['lock']:
+        next_item = batch['pending'].pop(0) if batch['pending'] else None
+        batch['remaining'] -= 1
+        last = batch['remaining'] == 0
+
+    if next_item:
+        manager['executor'].submit(_run_batch_job, batch, *next_item, client)
+    if last:
+        _save_batch(batch, client)
+
+def _save_batch(batch, client):
+    """Bulk insert every successful job of a finished batch"""
+    jobs = get_job_manager()['jobs']
+    batch['status'] = 'saving'
+    done = []
+    try:
+        done = [jobs[job_id] for job_id in batch['job_ids'] if jobs[job_id]['status'] == 'done']
+        _worker_state.supabase = client
+        save_analyses([_analysis_row(job['user_id'], job['filename'], job['results'],
+                                     job['file_path'], job['content_hash'])
+                       for job in done])
+        batch['saved'] = len(done)
+        batch['status'] = 'done'
+    except Exception as e:
+        print(f"Batch save error: {e}")
+        batch['error'] = str(e)
+        batch['status'] = 'failed'
+        # The bulk insert is all or nothing, so none of the uploads has a row
+        for job in done:
+            _rollback_upload(job['file_path'])
+    finally:
+        _worker_state.supabase = None
+        batch['finished_at'] = time.time()
+
+def _run_with_worker_client(client, func, *args):
+    """Run func(*args) on a pool thread with client bound for init_supabase()"""
+    _worker_state.supabase = client
+    try:
+        return func(*args)
+    finally:
+        _worker_state.supabase = None
+
+def _rollback_upload(file_path):
+    """Delete the uploaded video of a job whose analysis failed or could not be saved
+
+    The object is the job's own (see upload_video_to_storage), so no saved analysis
+    points at it. Best effort: runs while handling another error, so its own
+    errors are only logged.
+    """
+    if not file_path:
+        return
+    try:
+        delete_video_from_storage(file_path)
+    except Exception as e:
+        print(f"Upload rollback error: {e}")
+
+def _run_analysis_job(job, video, client, save=True):
+    """Worker: analyze, upload and (unless batched) save one video, recording the outcome on job"""
+    job['status'] = 'running'
+    try:
+        _worker_state.supabase = client
+
+        # Upload and inference are independent until save_analysis needs both - run them side by side
+        upload = get_job_manager()['upload_executor'].submit(
+            _run_with_worker_client, _worker_state.supabase,
+            upload_video_to_storage, video, job['user_id'], job['id']
+        )
+
+        try:
+            content_hash = hash_video(video)
+            results = analyze_gait(video, content_hash)
+        except Exception as e:
+            results = {"error": str(e)}
+
+        # Join before the insert; a failed upload still saves the analysis, without its video
+        try:
+            file_path = upload.result()
+        except Exception as e:
+            file_path = None
+            job['upload_error'] = str(e)
+
+        if "error" in results:
+            _rollback_upload(file_path)
+            job['results'] = results
+            job['error'] = results['error']
+            job['status'] = 'failed'
+            return
+
+        if save:
+            try:
+                save_analysis(job['user_id'],
+                              job['filename'],
+                              results,
+                              file_path,
+                              content_hash)
+            except Exception:
+                # Nothing points at the upload without the row
+                _rollback_upload(file_path)
+                raise
+
+        job['results'] = results
+        job['file_path'] = file_path
+        job['content_hash'] = content_hash
+        job['status'] = 'done'
+
+    except Exception as e:
+        print(f"Analysis job error: {e}")
+        job['error'] = str(e)
+        job['status'] = 'failed'
+
+    finally:
+        _worker_state.supabase = None
+        video.release()
+        job['finished_at'] = time.time()
+
 # Initialize Supabase tables (run SQL in Supabase dashboard first)
 # init_supabase_tables()  # Disabled - tables created manually
 
 
-# App configuration
-st.set_page_config(
-    page_title="Tru-Stride",
-    page_icon="assets/tru-stride-logo.png",  # Use logo as favicon
-    layout="wide"
-)
-
-# Add Open Graph meta tags for social media previews
-st.html("""
+# Open Graph meta tags for social media previews
+PAGE_META_HTML = """
     <!-- Open Graph / Facebook -->
     <meta property="og:type" content="website">
     <meta property="og:url" content="https://tru-stride.streamlit.app/">
@@ -610,10 +2228,10 @@ st.html("""
     <meta name="description" content="Horse gait analysis using artificial intelligence. Upload videos of your horse to get detailed stride analysis and performance insights.">
     <meta name="keywords" content="horse, gait, analysis, AI, artificial intelligence, equine, stride, performance">
     <meta name="author" content="Tru-Stride">
-""")
+"""
 
 # Custom CSS for logo colors and styling
-st.markdown("""
+PAGE_CSS = """
 <style>
     /* Custom color scheme based on logo */
     :root {
@@ -667,259 +2285,688 @@ st.markdown("""
         border-left: 4px solid var(--logo-foreground);
     }
 </style>
-""", unsafe_allow_html=True)
-
-# Main app
-def main():
-    # Add logo to sidebar
-    try:
-        with st.sidebar:
-            st.image("assets/tru-stride-logo.png", width=200)
-            st.markdown("---")  # Divider line
-    except:
-        pass  # If logo file not found, continue without it
+"""
+
+def show_page_head():
+    """Page config, meta tags and CSS - emitted at the start of every rerun"""
+    # App configuration
+    st.set_page_config(
+        page_title="Tru-Stride",
+        page_icon="assets/tru-stride-logo.png",  # Use logo as favicon
+        layout="wide"
+    )
+    st.html(get_page_head_html())
+
+@st.cache_resource
+def get_page_head_html():
+    """Meta tags and CSS as one minified block, built once per process"""
+    markup = re.sub(r'<!--.*?-->|/\*.*?\*/', '', PAGE_META_HTML + PAGE_CSS, flags=re.DOTALL)
+    return re.sub(r'\s*\n\s*', '', markup)
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_analysis_job_status():
+    """Poll the session's analysis job; reruns the app once it has finished"""
+    job = get_analysis_job(st.session_state.get('analysis_job_id'))
+
+    if job is None:
+        del st.session_state.analysis_job_id
+        st.warning("⚠️ Analysis job was lost (the server may have restarted). Please analyze the video again.")
+        return
 
-    st.title("🐎 Tru-Stride")
+    if job['status'] in ('queued', 'running'):
+        elapsed = time.time() - job['submitted_at']
+        state = "Waiting for a free analyzer" if job['status'] == 'queued' else "Analyzing gait patterns with AI model"
+        st.info(f"🔍 {state}: {job['filename']} ({elapsed:.0f}s)")
+        st.caption("You can switch tabs - results are saved to My Videos automatically.")
+        return
 
-    # Note: Session persistence across page refreshes is not supported due to
-    # Streamlit's session state limitations. Users need to login after each refresh.
+    del st.session_state.analysis_job_id
+    st.session_state.analysis_job_outcome = job
+    if job['status'] == 'done':
+        # Store results in session state so they persist
+        st.session_state.analysis_results = job['results']
+        st.session_state.analysis_filename = job['filename']
+    st.rerun()
+
+BATCH_STATUS_LABELS = {'queued': '⏳ Queued', 'running': '🔍 Analyzing', 'done': '✅ Done', 'failed': '❌ Failed'}
+
+def _batch_progress_frame(batch):
+    """One row per video of a batch snapshot"""
+    import pandas as pd
+
+    rows = []
+    for job in batch['jobs']:
+        results = job['results'] or {}
+        rows.append({
+            'File': job['filename'],
+            'Status': BATCH_STATUS_LABELS[job['status']],
+            'Classification': results.get('classification', ''),
+            'Rhythm': results.get('rhythm_score'),
+            'Symmetry': results.get('symmetry_score'),
+            'Error': job['error'] or (f"Video upload failed: {job['upload_error']}" if job['upload_error'] else '')
+        })
+    return pd.DataFrame(rows)
 
-    # Authentication
-    if 'user_id' not in st.session_state:
-        st.sidebar.header("🔐 Authentication")
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_analysis_batch_status():
+    """Poll the session's batch; reruns the app once every video is analyzed and saved"""
+    batch = get_analysis_batch(st.session_state.get('analysis_batch_id'))
 
-        # Toggle between login and signup
-        auth_mode = st.sidebar.radio("Choose action:", ["Login", "Sign Up Here"])
+    if batch is None:
+        del st.session_state.analysis_batch_id
+        st.warning("⚠️ Batch was lost (the server may have restarted). Videos that finished are in My Videos.")
+        return
 
-        if auth_mode == "Login":
-            st.sidebar.subheader("Login")
-
-            # Use form to ensure proper state management
-            with st.sidebar.form("login_form"):
-                email = st.text_input("Email", key="login_email")
-                password = st.text_input("Password", type="password", key="login_password")
-                login_button = st.form_submit_button("Login")
-
-                if login_button:
-                    if email and password:
-                        with st.spinner("Logging in..."):
-                            user_id, is_admin, username, error = authenticate_user(email, password)
-
-                        if user_id:
-                            st.session_state.user_id = user_id
-                            st.session_state.username = username
-                            st.session_state.is_admin = is_admin
-
-                            st.rerun()
-                        else:
-                            st.error(f"Login failed - Error: {error}")
-                            st.error(f"User ID returned: {user_id}")
-                    else:
-                        st.error("Please enter email and password")
-
-        else:  # Sign Up
-            st.sidebar.subheader("Sign Up Here")
-            new_username = st.sidebar.text_input("Choose Username", key="signup_username")
-            new_email = st.sidebar.text_input("Email Address", key="signup_email")
-            new_password = st.sidebar.text_input("Choose Password", type="password", key="signup_password")
-            confirm_password = st.sidebar.text_input("Confirm Password", type="password", key="confirm_password")
-
-            if st.sidebar.button("Sign Up", key="signup_button"):
-                if new_username and new_email and new_password and confirm_password:
-                    if new_password != confirm_password:
-                        st.sidebar.error("Passwords do not match")
-                    elif "@" not in new_email or "." not in new_email:
-                        st.sidebar.error("Please enter a valid email address")
-                    elif len(new_password) < 6:
-                        st.sidebar.error("Password must be at least 6 characters")
-                    else:
-                        # Prevent double submission
-                        if 'creating_user' not in st.session_state:
-                            st.session_state.creating_user = True
-
-                            try:
-                                with st.spinner("Creating account..."):
-                                    user_id, error = create_user(new_username, new_email, new_password)
-                            except Exception as e:
-                                del st.session_state.creating_user
-                                st.sidebar.error(f"Connection error: {str(e)}")
-                                st.stop()
-
-                            if user_id:
-                                # Don't auto-login, just show success message
-                                del st.session_state.creating_user
-                                st.sidebar.success("Account created! Please check your email to verify your account, then login.")
-                                st.rerun()
-                            else:
-                                del st.session_state.creating_user
-                                st.sidebar.error(error)
-                        else:
-                            st.sidebar.info("Creating account... please wait")
-                else:
-                    st.sidebar.error("Please fill in all fields")
-
-        # Show login/signup prompt
-        st.info("👆 Please login or sign up in the sidebar to continue")
+    if batch['finished_at'] is None:
+        finished = sum(job['status'] in ('done', 'failed') for job in batch['jobs'])
+        st.progress(finished / len(batch['jobs']),
+                    text=f"Analyzed {finished} of {len(batch['jobs'])} videos ({batch['concurrency']} at a time)")
+        st.dataframe(_batch_progress_frame(batch), hide_index=True, width='stretch')
+        st.caption("You can switch tabs - results are saved to My Videos when the batch finishes.")
+        return
 
+    del st.session_state.analysis_batch_id
+    st.session_state.analysis_batch_outcome = batch
+    st.rerun()
+
+def show_batch_analysis():
+    """Batch mode of the Analyze tab: many clips, analyzed concurrently and saved in bulk"""
+    batch_files = st.file_uploader(
+        "Upload videos of your horses",
+        type=['mp4', 'avi', 'mov', 'mkv'],
+        accept_multiple_files=True,
+        key="batch_uploader",
+        help=f"Upload up to {BATCH_MAX_FILES} clips from a session"
+    )
+
+    if ANALYSIS_WORKERS > 1:
+        concurrency = st.slider("Videos analyzed at once", 1, ANALYSIS_WORKERS, ANALYSIS_WORKERS,
+                                help="Higher is faster, up to what the analysis server can handle")
+    else:
+        concurrency = 1
 
+    batch_running = 'analysis_batch_id' in st.session_state
+    if batch_files and st.button(f"Analyze {len(batch_files)} Videos", type="primary", disabled=batch_running):
+        if len(batch_files) > BATCH_MAX_FILES:
+            st.error(f"Please upload at most {BATCH_MAX_FILES} videos per batch")
+        else:
+            with st.spinner("Preparing videos..."):
+                videos = [VideoBuffer(uploaded_file) for uploaded_file in batch_files]
+            st.session_state.analysis_batch_id = submit_analysis_batch(videos, st.session_state.user_id, concurrency)
+            if 'analysis_batch_outcome' in st.session_state:
+                del st.session_state.analysis_batch_outcome
+
+    # Pick up a batch still running from before a reconnect
+    if 'analysis_batch_id' not in st.session_state:
+        active_batches = get_active_analysis_batches(st.session_state.user_id)
+        if active_batches:
+            st.session_state.analysis_batch_id = active_batches[-1]
+
+    if 'analysis_batch_id' in st.session_state:
+        show_analysis_batch_status()
+
+    # Report how the last batch ended
+    if 'analysis_batch_outcome' in st.session_state:
+        batch = st.session_state.analysis_batch_outcome
+        failed = sum(job['status'] == 'failed' for job in batch['jobs'])
+
+        if batch['status'] == 'failed':
+            st.error(f"Batch results could not be saved: {batch['error']}")
+        else:
+            st.success(f"✅ {batch['saved']} analyses saved to My Videos!")
+        if failed:
+            st.warning(f"⚠️ {failed} videos could not be analyzed - see the table below")
+
+        st.dataframe(_batch_progress_frame(batch), hide_index=True, width='stretch')
+
+        st.button("Clear batch results", on_click=st.session_state.pop, args=('analysis_batch_outcome',))
+
+TREND_LABELS = {
+    'rhythm_score': 'Rhythm',
+    'symmetry_score': 'Symmetry',
+    'stride_variability': 'Stride Variability',
+    'knee_angle': 'Knee Angle',
+    'body_length_variation': 'Body Length Variation',
+}
+# Higher rhythm and symmetry are better, lower variability is better
+TREND_DELTA_COLORS = {
+    'rhythm_score': 'normal',
+    'symmetry_score': 'normal',
+    'stride_variability': 'inverse',
+    'knee_angle': 'off',
+    'body_length_variation': 'inverse',
+}
+
+def show_metric_trends(user_id):
+    """Trends view of My Videos: every metric over the user's analysis history"""
+    import pandas as pd
+    import plotly.graph_objects as go
+
+    trends = get_metric_trends(user_id)
+    if trends is None:
+        return
+    if trends.empty:
+        st.info("No analyses yet. Trends appear once you've analyzed a few videos.")
         return
 
-    # Sidebar navigation
-    st.sidebar.success(f"Logged in as: {st.session_state.username}")
-    if st.session_state.get('is_admin', False):
-        st.sidebar.info("👑 Admin Access")
-
-    if st.sidebar.button("Logout"):
-        # Sign out from Supabase
-        try:
-            supabase = init_supabase()
-            supabase.auth.sign_out()
-        except:
-            pass  # Continue even if Supabase sign out fails
-
-        # Clear session state including tokens
-        for key in ['user_id', 'username', 'is_admin', 'analysis_results', 'analysis_filename', 'access_token', 'refresh_token']:
-            if key in st.session_state:
-                del st.session_state[key]
-        st.rerun()
-
-    # Check admin status from database
-    is_admin = st.session_state.get('is_admin', False)
-
-    if is_admin:
-        tab1, tab2, tab3, tab4 = st.tabs(["📊 Admin Dashboard", "👥 User Management", "📹 Analyze Video", "📋 My Videos"])
+    limited = " (most recent)" if len(trends) >= TREND_MAX_POINTS else ""
+    st.caption(f"{len(trends)} analyses{limited} · rolling mean over {TREND_WINDOW} analyses")
+
+    # Current rolling mean per metric, compared with TREND_WINDOW analyses ago
+    means = trends[[f'{metric}_mean' for metric in TREND_METRICS]]
+    latest = means.iloc[-1]
+    earlier = means.iloc[-1 - TREND_WINDOW] if len(means) > TREND_WINDOW else None
+    for col, metric in zip(st.columns(len(TREND_METRICS)), TREND_METRICS):
+        value = latest[f'{metric}_mean']
+        delta = None if earlier is None else value - earlier[f'{metric}_mean']
+        col.metric(TREND_LABELS[metric],
+                   "–" if pd.isna(value) else f"{value:.2f}",
+                   None if delta is None or pd.isna(delta) else f"{delta:+.2f}",
+                   delta_color=TREND_DELTA_COLORS[metric])
+
+    metric = st.selectbox("Metric", TREND_METRICS, format_func=TREND_LABELS.get, key="trends_metric")
+    changes = trends[trends[f'{metric}_change']]
+
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(x=trends['upload_date'], y=trends[metric], mode='markers',
+                               name='Analysis', marker=dict(color='#7aa7c7', size=6, opacity=0.6)))
+    fig.add_trace(go.Scatter(x=trends['upload_date'], y=trends[f'{metric}_mean'], mode='lines',
+                             name=f'Rolling mean ({TREND_WINDOW})', line=dict(color='#1f4e79', width=3)))
+    fig.add_trace(go.Scatter(x=changes['upload_date'], y=changes[f'{metric}_mean'], mode='markers',
+                             name='Change point', marker=dict(color='#d62728', size=12, symbol='x')))
+    fig.update_layout(xaxis_title="Upload date", yaxis_title=TREND_LABELS[metric],
+                      legend=dict(orientation='h', y=-0.2))
+    st.plotly_chart(fig, width='stretch')
+
+    if not changes.empty:
+        dates = ", ".join(changes['upload_date'].dt.strftime('%Y-%m-%d'))
+        st.caption(f"{TREND_LABELS[metric]} shifted noticeably around: {dates}")
+
+def overall_score_gauge(overall_score, classification, reference=8.0, title="Overall Stride Quality"):
+    """Gauge of the overall stride quality score, with its delta from reference (8.0 is a good score)"""
+    import plotly.graph_objects as go
+
+    return go.Figure(go.Indicator(
+        mode = "gauge+number+delta",
+        value = overall_score,
+        domain = {'x': [0, 1], 'y': [0, 1]},
+        title = {'text': title},
+        delta = {'reference': reference},
+        gauge = {'axis': {'range': [None, 10]},
+               'bar': {'color': "darkgreen" if classification == "NORMAL" else "darkred"},
+               'steps': [
+                   {'range': [0, 5], 'color': "lightgray"},
+                   {'range': [5, 8], 'color': "yellow"},
+                   {'range': [8, 10], 'color': "lightgreen"}],
+               'threshold': {'line': {'color': "red", 'width': 4},
+                           'thickness': 0.75, 'value': 7}}))
+
+# Synchronized players
+# One iframe holds every video plus shared controls. Playing, pausing, seeking
+# or changing speed on any player applies to all of them, and players that
+# drift more than 0.15s from the first one are nudged back while playing.
+SYNCED_PLAYERS_HTML = """
+<style>
+  body { margin: 0; font-family: sans-serif; }
+  .players { display: grid; grid-template-columns: repeat(__COLUMNS__, 1fr); gap: 8px; }
+  .players figure { margin: 0; }
+  .players video { width: 100%; background: #000; border-radius: 4px; }
+  .players figcaption { font-size: 13px; color: #444; padding: 2px 0; }
+  .controls { display: flex; gap: 8px; align-items: center; margin-top: 8px; }
+  .controls input[type=range] { flex: 1; }
+</style>
+<div class="players">__PLAYERS__</div>
+<div class="controls">
+  <button id="play">▶ Play all</button>
+  <button id="restart">⏮ Restart</button>
+  <input id="seek" type="range" min="0" max="1000" value="0">
+  <select id="rate">
+    <option value="0.25">0.25×</option><option value="0.5">0.5×</option>
+    <option value="1" selected>1×</option><option value="2">2×</option>
+  </select>
+</div>
+<script>
+  const videos = [...document.querySelectorAll('video')];
+  const sources = __SOURCES__;
+  videos.forEach((video, i) => { video.src = sources[i]; });
+  const lead = videos[0];
+  let syncing = false;
+
+  function each(fn, except) {
+    if (syncing) return;
+    syncing = true;
+    videos.forEach(video => { if (video !== except) fn(video); });
+    syncing = false;
+  }
+  videos.forEach(video => {
+    video.addEventListener('play', () => each(v => v.play(), video));
+    video.addEventListener('pause', () => each(v => v.pause(), video));
+    video.addEventListener('seeked', () => each(v => { v.currentTime = video.currentTime; }, video));
+    video.addEventListener('ratechange', () => each(v => { v.playbackRate = video.playbackRate; }, video));
+  });
+
+  const play = document.getElementById('play');
+  const seek = document.getElementById('seek');
+  play.onclick = () => lead.paused ? lead.play() : lead.pause();
+  document.getElementById('restart').onclick = () => { lead.currentTime = 0; };
+  document.getElementById('rate').onchange = e => { lead.playbackRate = parseFloat(e.target.value); };
+  seek.oninput = () => { if (lead.duration) lead.currentTime = lead.duration * seek.value / 1000; };
+  lead.addEventListener('play', () => { play.textContent = '⏸ Pause all'; });
+  lead.addEventListener('pause', () => { play.textContent = '▶ Play all'; });
+
+  setInterval(() => {
+    if (lead.duration) seek.value = 1000 * lead.currentTime / lead.duration;
+    if (lead.paused) return;
+    videos.slice(1).forEach(video => {
+      if (!video.ended && Math.abs(video.currentTime - lead.currentTime) > 0.15) {
+        video.currentTime = lead.currentTime;
+      }
+    });
+  }, 250);
+</script>
+"""
+
+def synced_players_html(labels, urls):
+    """Markup for side-by-side players that play, pause and seek together"""
+    players = "".join(
+        f'<figure><video muted playsinline preload="metadata"></video>'
+        f'<figcaption>{html.escape(label)}</figcaption></figure>'
+        for label in labels
+    )
+    # URLs go in through JSON so nothing in them can break out of the script
+    sources = json.dumps(list(urls)).replace("</", "<\\/")
+    return (SYNCED_PLAYERS_HTML
+            .replace("__COLUMNS__", str(min(len(labels), 2)))
+            .replace("__PLAYERS__", players)
+            .replace("__SOURCES__", sources))
+
+def toggle_compare_video(video_id):
+    """Add a video to, or remove it from, the My Videos comparison"""
+    selected = st.session_state.setdefault('compare_video_ids', [])
+    if video_id in selected:
+        selected.remove(video_id)
     else:
-        tab1, tab2 = st.tabs(["📹 Analyze Video", "📋 My Videos"])
-
-    # Admin Dashboard (only for admins)
-    if is_admin:
-        with tab1:
-            st.header("Admin Dashboard")
-
-            # Get stats
-            total_users, total_videos, videos_per_user, upload_trends = get_user_stats()
-
-            # Key metrics
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("Total Users", total_users)
-            with col2:
-                st.metric("Total Videos", total_videos)
-            with col3:
-                avg_videos = total_videos / max(total_users, 1)
-                st.metric("Avg Videos/User", f"{avg_videos:.1f}")
-
-            # Charts
-            col1, col2 = st.columns(2)
+        selected.append(video_id)
+
+def clear_compare_videos():
+    for video_id in st.session_state.get('compare_video_ids', []):
+        st.session_state.pop(f"compare_{video_id}", None)
+    st.session_state.compare_video_ids = []
+
+COMPARE_METRICS = {
+    'confidence': 'Confidence',
+    'stride_length': 'Stride Length (m)',
+    'rhythm_score': 'Rhythm Score',
+    'symmetry_score': 'Symmetry Score',
+    'stride_variability': 'Stride Variability',
+    'knee_angle': 'Knee Angle (°)',
+    'body_length_variation': 'Body Length Variation',
+}
+
+def show_video_comparison(user_id):
+    """Compare view of My Videos: the selected videos side by side"""
+    selected = st.session_state.get('compare_video_ids', [])
+    if len(selected) < 2:
+        st.info(f"Tick \"Compare\" on two to {COMPARE_MAX_VIDEOS} videos in the list view to compare them here.")
+        return
 
-            with col1:
-                st.subheader("Videos per User")
-                if not videos_per_user.empty:
-                    fig = px.bar(videos_per_user,
-                               x='username', y='video_count',
-                               title="Video Uploads by User")
-                    # Force integer-only y-axis ticks
-                    fig.update_yaxes(dtick=1)
-                    st.plotly_chart(fig, width='stretch')
-                else:
-                    st.info("No video data yet")
+    # One query for the videos, one (cached) storage call for their playback URLs
+    videos = get_videos_for_comparison(user_id, tuple(selected))
+    if len(videos) < 2:
+        st.warning("The selected videos could not be loaded")
+        return
+    video_urls = get_video_urls(videos['file_path'].dropna().tolist())
+
+    labels = [f"{number}. {filename} ({upload_date[:10]})"
+              for number, (filename, upload_date) in enumerate(zip(videos['filename'], videos['upload_date']), 1)]
+    st.caption(f"Comparing {len(videos)} videos, oldest first - differences are against the oldest")
+
+    # Synchronized playback
+    playable = [(label, video_urls[path]) for label, path in zip(labels, videos['file_path'])
+                if path and video_urls.get(path)]
+    if len(playable) >= 2:
+        st.subheader("🎬 Synchronized Playback")
+        rows = -(-len(playable) // 2)
+        st.iframe(synced_players_html(*zip(*playable)), height=320 * rows + 60)
+    elif playable:
+        st.warning("Only one of the selected videos has a playable file")
+
+    # Metric diff table: one row per metric, differences against the first video
+    st.subheader("📊 Metric Differences")
+    metrics = videos[list(COMPARE_METRICS)].astype(float).T
+    metrics.columns = labels
+    diffs = metrics.iloc[:, 1:].sub(metrics.iloc[:, 0], axis=0).add_prefix("Δ ")
+    table = metrics.join(diffs)
+    table.index = list(COMPARE_METRICS.values())
+    st.dataframe(table.style.format("{:+.2f}", subset=list(diffs.columns)).format("{:.2f}", subset=labels),
+                 width='stretch')
+
+    # Overall score of each video, with its delta from the first
+    st.subheader("🎯 Overall Stride Quality")
+    overall = (videos['rhythm_score'] + videos['symmetry_score']) / 2
+    for col, label, score, classification in zip(st.columns(len(videos)), labels, overall,
+                                                 videos['classification']):
+        with col:
+            fig = overall_score_gauge(score, classification, reference=overall.iloc[0], title=label)
+            fig.update_layout(height=260, margin=dict(l=20, r=20, t=60, b=10))
+            st.plotly_chart(fig, width='stretch')
+
+    st.button("Clear comparison", on_click=clear_compare_videos)
+
+def show_analysis_export():
+    """Admin export of one user's or every user's analysis history"""
+    supabase = get_export_client()
+
+    col1, col2 = st.columns(2)
+    with col1:
+        # Only the first page of matching users is offered, searched in the database
+        search = st.text_input("Find user", key="export_user_search",
+                               placeholder="Username contains...").strip()
+        matches, next_cursor, counts = get_users_page(search, USER_PAGE_SIZES[0])
+        users = dict(zip(matches['id'], matches['username'])) if not matches.empty else {}
+        user_id = st.selectbox("Videos of", [None] + list(users),
+                               format_func=lambda user_id: "All users" if user_id is None else users[user_id],
+                               key="export_user")
+        if next_cursor:
+            st.caption(f"Showing {len(users)} of {counts['matching_users']} matching users - refine the search")
+    with col2:
+        file_format = st.radio("Format", available_export_formats(), horizontal=True, key="export_format")
+
+    extension, mime = EXPORT_FORMATS[file_format]
+    name = users[user_id] if user_id else "all-users"
+
+    # Runs on its own thread when clicked, so it gets the client rather than looking it up
+    def build_export():
+        return read_export(export_analysis_history(supabase, file_format, user_id))
+
+    st.download_button(f"Download {file_format}", data=build_export,
+                       file_name=f"tru-stride-{name}-{datetime.now():%Y%m%d}.{extension}",
+                       mime=mime, on_click="ignore", key="export_download")
+    st.caption("One row per video with every analysis metric as a column. "
+               "Rows are fetched and written a page at a time.")
+
+@profiled_fragment(key="admin_dashboard")
+def show_admin_dashboard():
+    """Site-wide stats, upload trends and cache health"""
+    import plotly.express as px
+
+    # Get stats
+    total_users, total_videos, videos_per_user = get_user_stats()
+
+    # Key metrics
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Total Users", total_users)
+    with col2:
+        st.metric("Total Videos", total_videos)
+    with col3:
+        avg_videos = total_videos / max(total_users, 1)
+        st.metric("Avg Videos/User", f"{avg_videos:.1f}")
+
+    # Charts
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("Videos per User")
+        if not videos_per_user.empty:
+            fig = px.bar(videos_per_user,
+                       x='username', y='video_count',
+                       title="Video Uploads by User")
+            # Force integer-only y-axis ticks
+            fig.update_yaxes(dtick=1)
+            st.plotly_chart(fig, width='stretch')
+        else:
+            st.info("No video data yet")
+
+    with col2:
+        trend_days = st.radio("Window", UPLOAD_TREND_WINDOWS, index=1, horizontal=True,
+                              key="upload_trend_days", format_func=lambda d: f"{d} days")
+        st.subheader(f"Upload Trends (Last {trend_days} Days)")
+        upload_trends = get_upload_trends(trend_days)
+        if not upload_trends.empty and upload_trends['uploads'].sum() > 0:
+            # Use scatter plot with lines and markers for better single-point visibility
+            fig = px.line(upload_trends,
+                        x='date', y='uploads',
+                        title="Daily Upload Trends",
+                        markers=trend_days <= 30)  # Markers only while days stay distinguishable
+
+            # Integer-only y-axis ticks while counts are small
+            fig.update_yaxes(rangemode='tozero',
+                             dtick=1 if upload_trends['uploads'].max() <= 10 else None)
+
+            # Show every day on short windows; longer ones use Plotly's date ticks
+            if trend_days <= 7:
+                fig.update_xaxes(tickmode='linear', dtick="D1")
+
+            fig.update_traces(line=dict(width=3 if trend_days <= 30 else 2))
+
+            st.plotly_chart(fig, width='stretch')
+        else:
+            st.info("No uploads in this window")
+
+    # Detailed user table
+    st.subheader("User Activity Overview")
+    # Add admin indicator to the table
+    display_df = videos_per_user.copy()
+    display_df['Role'] = display_df['is_admin'].apply(lambda x: '👑 Admin' if x else '👤 User')
+    st.dataframe(display_df[['username', 'Role', 'video_count']], width='stretch')
+
+    # Analysis cache effectiveness
+    st.subheader("Analysis Cache")
+    cache_stats = get_analysis_cache_stats()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Cache Hit Rate", f"{cache_stats['hit_rate']*100:.0f}%")
+    with col2:
+        st.metric("Model Time Saved", f"{cache_stats['saved_seconds']:.0f}s")
+    with col3:
+        st.metric("Cached Results", cache_stats['entries'])
+    st.caption(f"{cache_stats['memory_hits']} memory hits, {cache_stats['db_hits']} database hits, "
+               f"{cache_stats['misses']} misses since this server started")
+
+    # Read cache - reruns from unrelated widgets should only add hits
+    st.subheader("Query Cache")
+    query_stats = get_query_cache_stats()
+    if query_stats.empty:
+        st.info("No cached queries yet")
+    else:
+        st.dataframe(query_stats, hide_index=True, width='stretch', column_config={
+            'hit_rate': st.column_config.ProgressColumn("Hit Rate", format="percent", min_value=0, max_value=1)
+        })
 
-            with col2:
-                st.subheader("Upload Trends (Last 30 Days)")
-                if not upload_trends.empty:
-                    # Use scatter plot with lines and markers for better single-point visibility
-                    fig = px.line(upload_trends,
-                                x='date', y='uploads',
-                                title="Daily Upload Trends",
-                                markers=True)  # Add markers to show data points
-
-                    # Force integer-only y-axis ticks
-                    fig.update_yaxes(dtick=1)
-
-                    # Ensure proper date formatting and spacing
-                    fig.update_xaxes(
-                        tickmode='linear',
-                        dtick="D1"  # Show every day
-                    )
-
-                    # Make sure single points are visible
-                    fig.update_traces(
-                        mode='lines+markers',
-                        marker=dict(size=8),
-                        line=dict(width=3)
-                    )
-
-                    st.plotly_chart(fig, width='stretch')
-                else:
-                    st.info("No upload trend data yet")
+    # Client pool counters - a rerun should add at most one miss
+    pool_stats = get_supabase_pool_stats()
+    st.caption(f"Supabase client pool (this session): {pool_stats['hits']} hits, {pool_stats['misses']} misses")
+
+    # Export - only loads the user list when opened
+    export = st.expander("📤 Export Analysis History", key="export_expander", on_change="rerun")
+    if export.open:
+        with export:
+            show_analysis_export()
+
+
+def reset_user_pages():
+    """Go back to the first page of User Management"""
+    st.session_state.users_page_cursors = [None]
+
+def save_admin_changes(changes, editor_key):
+    set_admin_statuses(changes)
+    # Start the edited page afresh from the saved data
+    st.session_state.pop(editor_key, None)
+    promoted = sum(changes.values())
+    # Shown by the fragment - elements drawn in a callback would land at the top of the app
+    st.session_state.admin_changes_saved = f"Saved: {promoted} promoted, {len(changes) - promoted} demoted"
+    # The dashboard's roles changed too; the other tabs don't depend on them
+    st.rerun(["user_management", "admin_dashboard"])
+
+@profiled_fragment(key="user_management")
+def show_user_management():
+    """Searchable, paginated user table; admin changes are saved together"""
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        search = st.text_input("Search users", key="user_search", placeholder="Username contains...",
+                               on_change=reset_user_pages).strip()
+    with col2:
+        page_size = st.selectbox("Users per page", USER_PAGE_SIZES, key="users_page_size",
+                                 on_change=reset_user_pages)
+
+    # Cursor of every page visited so far - the last one is the current page
+    if 'users_page_cursors' not in st.session_state:
+        reset_user_pages()
+    page_cursors = st.session_state.users_page_cursors
+
+    if 'admin_changes_saved' in st.session_state:
+        st.toast(st.session_state.pop('admin_changes_saved'))
+
+    users, next_cursor, counts = get_users_page(search, page_size, page_cursors[-1])
+
+    st.subheader("User Summary")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("👑 Admins", counts['admin_users'])
+    with col2:
+        st.metric("👤 Regular Users", counts['total_users'] - counts['admin_users'])
+    with col3:
+        st.metric("📊 Total Users", counts['total_users'])
+
+    if users.empty:
+        st.info("No users match your search" if search else "No users found")
+        return
 
-            # Detailed user table
-            st.subheader("User Activity Overview")
-            # Add admin indicator to the table
-            display_df = videos_per_user.copy()
-            display_df['Role'] = display_df['is_admin'].apply(lambda x: '👑 Admin' if x else '👤 User')
-            st.dataframe(display_df[['username', 'Role', 'video_count']], width='stretch')
+    st.subheader("All Users" if not search else f"Users matching \"{search}\"")
+    editor_key = f"users_editor_{search}_{page_size}_{len(page_cursors)}"
+    edited = st.data_editor(
+        users.assign(created_at=users['created_at'].str[:10]),
+        key=editor_key,
+        hide_index=True,
+        width='stretch',
+        column_order=['username', 'created_at', 'video_count', 'is_admin'],
+        disabled=['username', 'created_at', 'video_count'],
+        column_config={
+            'username': "Username",
+            'created_at': "Joined",
+            'video_count': st.column_config.NumberColumn("Videos"),
+            'is_admin': st.column_config.CheckboxColumn("👑 Admin", help="Tick to grant admin access")
+        }
+    )
+
+    changed = edited['is_admin'] != users['is_admin']
+    # Don't allow demoting yourself
+    if (changed & (users['id'] == st.session_state.user_id)).any():
+        st.warning("You can't change your own admin status - that change will be ignored")
+        changed &= users['id'] != st.session_state.user_id
+    changes = dict(zip(users.loc[changed, 'id'], edited.loc[changed, 'is_admin'].astype(bool)))
+
+    st.button(f"Save {len(changes)} admin changes" if changes else "No changes to save",
+              type="primary", disabled=not changes,
+              on_click=save_admin_changes, args=(changes, editor_key))
+
+    # Page navigation - callbacks, so the page changes within this fragment's rerun
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("◀ Previous", key="users_previous", disabled=len(page_cursors) == 1, on_click=page_cursors.pop)
+    with col2:
+        st.caption(f"Page {len(page_cursors)} of {max(1, -(-counts['matching_users'] // page_size))}")
+    with col3:
+        st.button("Next ▶", key="users_next", disabled=next_cursor is None,
+                  on_click=page_cursors.append, args=(next_cursor,))
+
+PERFORMANCE_WINDOWS = {"Last hour": 3600, "Last 24 hours": 86400, "Last 7 days": 7 * 86400, "Last 30 days": 30 * 86400}
+PERFORMANCE_CHART_POINTS = 48
+
+@profiled_fragment(key="performance")
+def show_performance():
+    """Per-stage latency percentiles from the local metrics store"""
+    import pandas as pd
+    import plotly.express as px
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        window = st.radio("Window", list(PERFORMANCE_WINDOWS), index=1, horizontal=True, key="performance_window")
+    with col2:
+        percentile = st.selectbox("Chart", ["p50", "p95", "p99"], index=1, key="performance_percentile")
+
+    seconds = PERFORMANCE_WINDOWS[window]
+    histograms = get_latency_histograms(time.time() - seconds)
+    if histograms.empty:
+        st.info("No timings recorded in this window yet")
+        return
 
-        # User Management Tab (Admin only)
-        with tab2:
-            if is_admin:
-                st.header("👥 User Management")
+    summary = latency_percentiles(histograms, ['stage'])
+    summary[['p50', 'p95', 'p99']] *= 1000
+    st.dataframe(
+        summary.sort_values('p95', ascending=False),
+        hide_index=True,
+        width='stretch',
+        column_config={
+            'stage': "Stage",
+            'count': st.column_config.NumberColumn("Calls"),
+            'p50': st.column_config.NumberColumn("p50", format="%.0f ms"),
+            'p95': st.column_config.NumberColumn("p95", format="%.0f ms"),
+            'p99': st.column_config.NumberColumn("p99", format="%.0f ms")
+        }
+    )
+
+    # Merge stored periods so the chart has about PERFORMANCE_CHART_POINTS points
+    step = max(METRICS_PERIOD_SECONDS, seconds // PERFORMANCE_CHART_POINTS // METRICS_PERIOD_SECONDS * METRICS_PERIOD_SECONDS)
+    over_time = latency_percentiles(histograms.assign(period=histograms['period'] // step * step), ['stage', 'period'])
+    over_time['time'] = pd.to_datetime(over_time['period'], unit='s')
+    over_time[percentile] *= 1000
+
+    fig = px.line(over_time, x='time', y=percentile, color='stage', markers=True,
+                  title=f"{percentile} latency by stage", labels={percentile: f"{percentile} (ms)", 'time': ""})
+    fig.update_yaxes(type='log')
+    st.plotly_chart(fig, width='stretch')
+    st.caption(f"Timings are kept for {METRICS_RETENTION_DAYS} days in this app instance's local metrics store")
+
+    show_profile_hotspots()
+
+def show_profile_hotspots():
+    """Top functions across the newest profiled reruns, plus the raw folded stacks"""
+    st.subheader("Rerun Hotspots")
+    profiles = list_profiles()
+    if not profiles:
+        st.info("No profiled reruns yet - open the app with ?profile=1 (or set PROFILE_RERUNS=1) to record them")
+        return
 
-                # Get all users
-                all_users = get_all_users()
-
-                if not all_users.empty:
-                    st.subheader("All Users")
-
-                    for idx, user in all_users.iterrows():
-                        with st.expander(f"{'👑' if user['is_admin'] else '👤'} {user['username']} ({user['video_count']} videos)"):
-
-                            col1, col2 = st.columns([3, 1])
-
-                            with col1:
-                                st.write(f"**Email:** {user['email']}")
-                                st.write(f"**Joined:** {user['created_at'][:10]}")
-                                st.write(f"**Videos:** {user['video_count']}")
-                                st.write(f"**Status:** {'👑 Admin' if user['is_admin'] else '👤 Regular User'}")
-
-                            with col2:
-                                # Don't allow demoting yourself
-                                if user['username'] != st.session_state.username:
-                                    if user['is_admin']:
-                                        if st.button(f"Remove Admin", key=f"demote_{user['id']}"):
-                                            toggle_admin_status(user['id'], False)
-                                            st.success(f"Removed admin access from {user['username']}")
-                                            st.rerun()
-                                    else:
-                                        if st.button(f"Make Admin", key=f"promote_{user['id']}"):
-                                            toggle_admin_status(user['id'], True)
-                                            st.success(f"Granted admin access to {user['username']}")
-                                            st.rerun()
-                                else:
-                                    st.info("(You)")
-
-                    # Summary stats
-                    admin_count = all_users['is_admin'].sum()
-                    regular_count = len(all_users) - admin_count
-
-                    st.subheader("User Summary")
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.metric("👑 Admins", admin_count)
-                    with col2:
-                        st.metric("👤 Regular Users", regular_count)
-                    with col3:
-                        st.metric("📊 Total Users", len(all_users))
+    recent = profiles[:PROFILE_HOTSPOT_RERUNS]
+    hotspots, samples = get_profile_hotspots(recent)
+    st.caption(f"{samples} samples ({PROFILE_SAMPLE_SECONDS * 1000:.0f}ms apart) from the newest {len(recent)} "
+               f"profiled reruns" + (" - profiling is on for this session" if profiling_enabled() else ""))
+    if st.checkbox("Only functions in streamlit_app.py", value=True, key="profile_app_only"):
+        hotspots = hotspots[hotspots['function'].str.contains("(streamlit_app.py:", regex=False)]
+        hotspots = hotspots.sort_values('total_samples', ascending=False)
+    st.dataframe(
+        hotspots.head(25),
+        hide_index=True,
+        width='stretch',
+        column_config={
+            'function': "Function",
+            'self_samples': None,
+            'total_samples': None,
+            'self_pct': st.column_config.ProgressColumn("Self", format="percent", min_value=0, max_value=1),
+            'total_pct': st.column_config.ProgressColumn("Total", format="percent", min_value=0, max_value=1)
+        }
+    )
 
-                else:
-                    st.info("No users found")
+    # Raw folded stacks of one rerun, for flamegraph.pl or speedscope
+    name = st.selectbox("Rerun", profiles, key="profile_file")
+    with open(os.path.join(PROFILE_DIR, name)) as f:
+        st.download_button("Download folded stacks", f.read(), file_name=name, mime="text/plain")
 
+def reset_video_pages():
+    """Go back to the first (newest) page of My Videos"""
+    st.session_state.videos_page_cursors = [None]
 
-    # Video Analysis Tab
-    analysis_tab = tab3 if is_admin else tab1
-    with analysis_tab:
-        st.header("Analyze Horse Gait")
+@profiled_fragment(key="video_analysis")
+def show_video_analysis():
+    """Analyze tab: one video at a time, or a whole batch"""
+    analysis_mode = st.radio("Mode", ["Single video", "Batch"], horizontal=True, key="analysis_mode",
+                             help="Batch mode analyzes a whole session's clips at once")
 
+    if analysis_mode == "Batch":
+        show_batch_analysis()
+    else:
         uploaded_file = st.file_uploader(
             "Upload a video of your horse",
             type=['mp4', 'avi', 'mov', 'mkv'],
@@ -927,39 +2974,43 @@ def main():
         )
 
         if uploaded_file is not None:
-            # Display video
-            st.video(uploaded_file)
-
-            if st.button("Analyze Gait", type="primary"):
-                with st.spinner("🔍 Analyzing gait patterns with AI model..."):
-                    # Reset file pointer to beginning
-                    uploaded_file.seek(0)
-
-                    # Analyze the video using your HuggingFace model
-                    results = analyze_gait(uploaded_file)
-
-                    if "error" in results:
-                        st.error(f"Analysis failed: {results['error']}")
-                        st.info("💡 Tip: Make sure your video is clear and shows the horse's full body in motion")
-                    else:
-                        # Upload video to Supabase Storage
-                        with st.spinner("Uploading video..."):
-                            file_path = upload_video_to_storage(uploaded_file, st.session_state.user_id)
+            # One buffer feeds the preview, the analysis and the upload
+            video = get_session_video_buffer(uploaded_file)
 
-                        # Save to database with video file path
-                        save_analysis(st.session_state.user_id,
-                                    uploaded_file.name,
-                                    str(results),
-                                    file_path)
+            # Display video
+            st.video(video.media)
 
-                        # Store results in session state so they persist
-                        st.session_state.analysis_results = results
+            analysis_running = 'analysis_job_id' in st.session_state
+            if st.button("Analyze Gait", type="primary", disabled=analysis_running):
+                # Queue the analysis - a worker analyzes, uploads and saves in the background
+                st.session_state.analysis_job_id = submit_analysis_job(video, st.session_state.user_id)
+                for key in ['analysis_results', 'analysis_filename']:
+                    if key in st.session_state:
+                        del st.session_state[key]
 
-                        if file_path:
-                            st.success("✅ Video uploaded and analysis saved!")
-                        else:
-                            st.warning("⚠️ Analysis saved but video upload failed")
-                        st.session_state.analysis_filename = uploaded_file.name
+        else:
+            release_session_video_buffer()
+
+        # Pick up a job still running from before a reconnect
+        if 'analysis_job_id' not in st.session_state:
+            active_jobs = get_active_analysis_jobs(st.session_state.user_id)
+            if active_jobs:
+                st.session_state.analysis_job_id = active_jobs[-1]['id']
+
+        if 'analysis_job_id' in st.session_state:
+            show_analysis_job_status()
+
+        # Report how the last job ended
+        if 'analysis_job_outcome' in st.session_state:
+            job = st.session_state.pop('analysis_job_outcome')
+            if job['status'] == 'failed':
+                st.error(f"Analysis failed: {job['error']}")
+                st.info("💡 Tip: Make sure your video is clear and shows the horse's full body in motion")
+            elif job['file_path']:
+                st.success("✅ Video uploaded and analysis saved!")
+            else:
+                st.warning(f"⚠️ Analysis saved but video upload failed: {job['upload_error']}"
+                           if job.get('upload_error') else "⚠️ Analysis saved but video upload failed")
 
         # Display results if they exist in session state
         if 'analysis_results' in st.session_state:
@@ -1016,20 +3067,7 @@ def main():
             if results['rhythm_score'] > 0 and results['symmetry_score'] > 0:
                 overall_score = (results['rhythm_score'] + results['symmetry_score']) / 2
 
-                fig = go.Figure(go.Indicator(
-                    mode = "gauge+number+delta",
-                    value = overall_score,
-                    domain = {'x': [0, 1], 'y': [0, 1]},
-                    title = {'text': "Overall Stride Quality"},
-                    delta = {'reference': 8.0},  # Good score reference
-                    gauge = {'axis': {'range': [None, 10]},
-                           'bar': {'color': "darkgreen" if classification == "NORMAL" else "darkred"},
-                           'steps': [
-                               {'range': [0, 5], 'color': "lightgray"},
-                               {'range': [5, 8], 'color': "yellow"},
-                               {'range': [8, 10], 'color': "lightgreen"}],
-                           'threshold': {'line': {'color': "red", 'width': 4},
-                                       'thickness': 0.75, 'value': 7}}))
+                fig = overall_score_gauge(overall_score, classification)
                 st.plotly_chart(fig, width='stretch')
 
             # Show raw output for debugging (remove in production)
@@ -1039,25 +3077,60 @@ def main():
                 st.subheader("🔧 Raw Model Output")
                 st.json(results)
 
-    # My Videos Tab
-    videos_tab = tab4 if is_admin else tab2
-    with videos_tab:
-        st.header("My Video Analysis History")
+@profiled_fragment(key="my_videos")
+def show_my_videos():
+    """My Videos tab: the user's analyses as a paged list, trends or a comparison"""
+    videos_view = st.radio("View", ["List", "Trends", "Compare"], horizontal=True, key="videos_view",
+                           help="Trends plots your horses' metrics across all your analyses; "
+                                "Compare shows the videos you ticked side by side")
+
+    if videos_view == "Trends":
+        show_metric_trends(st.session_state.user_id)
+    elif videos_view == "Compare":
+        show_video_comparison(st.session_state.user_id)
+    else:
+        page_size = st.selectbox("Videos per page", VIDEO_PAGE_SIZES, index=1,
+                                 key="videos_page_size", on_change=reset_video_pages)
 
-        user_videos = get_user_videos(st.session_state.user_id)
+        # Cursor of every page visited so far - the last one is the current page
+        if 'videos_page_cursors' not in st.session_state:
+            reset_video_pages()
+        page_cursors = st.session_state.videos_page_cursors
+
+        user_videos, next_cursor, total_videos = get_user_videos(st.session_state.user_id, page_size, page_cursors[-1])
+        if total_videos is None:
+            total_videos = st.session_state.get('videos_total', len(user_videos))
+        st.session_state.videos_total = total_videos
 
         if user_videos.empty:
             st.info("No videos uploaded yet. Upload your first video in the 'Analyze Video' tab!")
         else:
-            st.write(f"Total videos: {len(user_videos)}")
+            st.write(f"Total videos: {total_videos}")
+
+            # Sign every playback URL on this page with one (cached) storage call
+            video_urls = get_video_urls(user_videos['file_path'].dropna().tolist())
 
+            compare_ids = st.session_state.get('compare_video_ids', [])
             for idx, video in user_videos.iterrows():
-                with st.expander(f"📹 {video['filename']} - {video['upload_date'][:16]}"):
+                video_col, compare_col = st.columns([6, 1], vertical_alignment="center")
+                selected = video['id'] in compare_ids
+                compare_col.checkbox("Compare", value=selected, key=f"compare_{video['id']}",
+                                     disabled=not selected and len(compare_ids) >= COMPARE_MAX_VIDEOS,
+                                     on_change=toggle_compare_video, args=(int(video['id']),))
+
+                expander = video_col.expander(f"📹 {video['filename']} - {video['upload_date'][:16]}",
+                                              key=f"video_{video['id']}", on_change="rerun")
+
+                # Playback and results are only loaded for opened videos
+                if not expander.open:
+                    continue
+
+                with expander:
 
                     # Video playback section
                     if video.get('file_path'):
                         try:
-                            video_url = get_video_url(video['file_path'])
+                            video_url = video_urls.get(video['file_path'])
                             if video_url:
                                 st.subheader("🎬 Video Playback")
                                 st.video(video_url)
@@ -1068,25 +3141,200 @@ def main():
                     else:
                         st.info("Video file not stored (uploaded before video storage was implemented)")
 
-                    # Parse results (in real app, store as JSON)
-                    try:
-                        results = eval(video['analysis_results'])  # Don't use eval in production!
-
+                    # Results were decoded once by get_user_videos
+                    if video['has_results']:
                         st.subheader("📊 Analysis Results")
                         col1, col2 = st.columns(2)
                         with col1:
                             st.write("**Results:**")
-                            st.write(f"• Primary Gait: {results['primary_gait']}")
-                            st.write(f"• Confidence: {results['confidence']*100:.0f}%")
-                            st.write(f"• Stride Length: {results['stride_length']}m")
+                            st.write(f"• Primary Gait: {video['primary_gait']}")
+                            st.write(f"• Confidence: {video['confidence']*100:.0f}%")
+                            st.write(f"• Stride Length: {video['stride_length']}m")
 
                         with col2:
                             st.write("**Quality Scores:**")
-                            st.write(f"• Rhythm: {results['rhythm_score']}/10")
-                            st.write(f"• Symmetry: {results['symmetry_score']}/10")
+                            st.write(f"• Rhythm: {video['rhythm_score']}/10")
+                            st.write(f"• Symmetry: {video['symmetry_score']}/10")
 
-                    except:
+                    else:
                         st.write("Error displaying results")
 
+            # Page navigation - callbacks, so the page changes within this fragment's rerun
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                st.button("◀ Newer", key="videos_newer", disabled=len(page_cursors) == 1, on_click=page_cursors.pop)
+            with col2:
+                st.caption(f"Page {len(page_cursors)} of {-(-total_videos // page_size)}")
+            with col3:
+                st.button("Older ▶", key="videos_older", disabled=next_cursor is None,
+                          on_click=page_cursors.append, args=(next_cursor,))
+
+# Main app
+def main():
+    show_page_head()
+
+    # Add logo to sidebar
+    try:
+        with st.sidebar:
+            st.image("assets/tru-stride-logo.png", width=200)
+            st.markdown("---")  # Divider line
+    except:
+        pass  # If logo file not found, continue without it
+
+    st.title("🐎 Tru-Stride")
+
+    # Note: Session persistence across page refreshes is not supported due to
+    # Streamlit's session state limitations. Users need to login after each refresh.
+
+    # Authentication
+    if 'user_id' not in st.session_state:
+        st.sidebar.header("🔐 Authentication")
+
+        # Toggle between login and signup
+        auth_mode = st.sidebar.radio("Choose action:", ["Login", "Sign Up Here"])
+
+        if auth_mode == "Login":
+            st.sidebar.subheader("Login")
+
+            # Use form to ensure proper state management
+            with st.sidebar.form("login_form"):
+                email = st.text_input("Email", key="login_email")
+                password = st.text_input("Password", type="password", key="login_password")
+                login_button = st.form_submit_button("Login")
+
+                if login_button:
+                    if email and password:
+                        with st.spinner("Logging in..."):
+                            user_id, is_admin, username, error = authenticate_user(email, password)
+
+                        if user_id:
+                            st.session_state.user_id = user_id
+                            st.session_state.username = username
+                            st.session_state.is_admin = is_admin
+
+                            # Wake the Gradio space while the app loads for the first user
+                            start_gradio_warmup()
+
+                            st.rerun()
+                        else:
+                            st.error(f"Login failed - Error: {error}")
+                            st.error(f"User ID returned: {user_id}")
+                    else:
+                        st.error("Please enter email and password")
+
+        else:  # Sign Up
+            st.sidebar.subheader("Sign Up Here")
+            new_username = st.sidebar.text_input("Choose Username", key="signup_username")
+            new_email = st.sidebar.text_input("Email Address", key="signup_email")
+            new_password = st.sidebar.text_input("Choose Password", type="password", key="signup_password")
+            confirm_password = st.sidebar.text_input("Confirm Password", type="password", key="confirm_password")
+
+            if st.sidebar.button("Sign Up", key="signup_button"):
+                if new_username and new_email and new_password and confirm_password:
+                    if new_password != confirm_password:
+                        st.sidebar.error("Passwords do not match")
+                    elif "@" not in new_email or "." not in new_email:
+                        st.sidebar.error("Please enter a valid email address")
+                    elif len(new_password) < 6:
+                        st.sidebar.error("Password must be at least 6 characters")
+                    else:
+                        # Prevent double submission
+                        if 'creating_user' not in st.session_state:
+                            st.session_state.creating_user = True
+
+                            try:
+                                with st.spinner("Creating account..."):
+                                    user_id, error = create_user(new_username, new_email, new_password)
+                            except Exception as e:
+                                del st.session_state.creating_user
+                                st.sidebar.error(f"Connection error: {str(e)}")
+                                st.stop()
+
+                            if user_id:
+                                # Don't auto-login, just show success message
+                                del st.session_state.creating_user
+                                st.sidebar.success("Account created! Please check your email to verify your account, then login.")
+                                st.rerun()
+                            else:
+                                del st.session_state.creating_user
+                                st.sidebar.error(error)
+                        else:
+                            st.sidebar.info("Creating account... please wait")
+                else:
+                    st.sidebar.error("Please fill in all fields")
+
+        # Show login/signup prompt
+        st.info("👆 Please login or sign up in the sidebar to continue")
+
+
+        return
+
+    # Sidebar navigation
+    st.sidebar.success(f"Logged in as: {st.session_state.username}")
+    if st.session_state.get('is_admin', False):
+        st.sidebar.info("👑 Admin Access")
+
+    if st.sidebar.button("Logout"):
+        # Sign out from Supabase
+        try:
+            supabase = init_supabase()
+            supabase.auth.sign_out()
+        except:
+            pass  # Continue even if Supabase sign out fails
+        clear_supabase_pool()
+
+        # Clear session state including tokens
+        release_session_video_buffer()
+        for key in ['user_id', 'username', 'is_admin', 'analysis_results', 'analysis_filename', 'analysis_job_id', 'analysis_batch_id', 'analysis_batch_outcome', 'compare_video_ids', 'users_page_cursors', 'access_token', 'refresh_token']:
+            if key in st.session_state:
+                del st.session_state[key]
+        st.rerun()
+
+    # Check admin status from database
+    is_admin = st.session_state.get('is_admin', False)
+
+    # Each tab's body is a fragment: a widget in one tab reruns only that tab,
+    # so its queries and signed URLs aren't fetched again for the others.
+    # Login, logout and finished analyses (which add a video) rerun the app.
+
+    if is_admin:
+        tab1, tab2, tab3, tab4, tab5 = st.tabs(["📊 Admin Dashboard", "👥 User Management", "📹 Analyze Video", "📋 My Videos", "⏱️ Performance"])
+    else:
+        tab1, tab2 = st.tabs(["📹 Analyze Video", "📋 My Videos"])
+
+    # Admin Dashboard (only for admins)
+    if is_admin:
+        with tab1:
+            st.header("Admin Dashboard")
+
+            show_admin_dashboard()
+
+        # User Management Tab (Admin only)
+        with tab2:
+            if is_admin:
+                st.header("👥 User Management")
+
+                show_user_management()
+
+        # Performance Tab (Admin only)
+        with tab5:
+            st.header("⏱️ Performance")
+
+            show_performance()
+
+    # Video Analysis Tab
+    analysis_tab = tab3 if is_admin else tab1
+    with analysis_tab:
+        st.header("Analyze Horse Gait")
+
+        show_video_analysis()
+
+    # My Videos Tab
+    videos_tab = tab4 if is_admin else tab2
+    with videos_tab:
+        st.header("My Video Analysis History")
+
+        show_my_videos()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run_profiled(main)
\ No newline at end of file
@@ -0,0 +1,208 @@
+"""
+Checks the SQL in SUPABASE_SETUP.md against a throwaway Postgres
+
+Loads sections 2 to 2h into a fresh database, fills it with random users and
+videos, and compares the dashboard aggregates (2d), the user management
+functions (2g) and the daily upload rollup (2h) with a recount in Python.
+
+Needs psycopg and TEST_DATABASE_URL, a Postgres URL whose user may create
+databases - the test creates its own database and drops it afterwards. Skipped
+otherwise.
+
+Usage: TEST_DATABASE_URL=postgresql://postgres@localhost/postgres python -m pytest tests
+"""
+import os
+import re
+import sys
+import uuid
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+from psycopg.conninfo import make_conninfo  # noqa: E402
+from psycopg.types.json import Jsonb  # noqa: E402
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, REPO_ROOT)
+from streamlit_app import _like_pattern  # noqa: E402
+
+DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL not set")
+
+# What the SQL expects of Supabase: auth.users (whose inserts create profiles) and auth.uid()
+SUPABASE_AUTH_SQL = """
+CREATE SCHEMA auth;
+CREATE TABLE auth.users (id UUID PRIMARY KEY, email TEXT, raw_user_meta_data JSONB);
+CREATE FUNCTION auth.uid() RETURNS UUID LANGUAGE sql STABLE AS $$ SELECT NULL::uuid $$;
+"""
+
+USERS = 60
+VIDEOS = 2000
+DAYS = 45
+
+def setup_sql(trigram_search=True):
+    """The SQL of sections 2 to 2h, in order
+
+    Without pg_trgm its extension and index lines are dropped - they only make
+    the username search faster.
+    """
+    with open(os.path.join(REPO_ROOT, 'SUPABASE_SETUP.md')) as f:
+        guide = f.read()
+    sections = re.split(r'^## ', guide, flags=re.MULTILINE)
+    blocks = [block for section in sections if re.match(r'2[a-h]?\. ', section)
+              for block in re.findall(r'```sql\n(.*?)```', section, re.DOTALL)]
+    sql = '\n'.join(blocks)
+    if not trigram_search:
+        sql = '\n'.join(line for line in sql.splitlines() if 'trgm' not in line)
+    return sql
+
+@pytest.fixture(scope='module')
+def db():
+    """Connection to a new database with the setup SQL loaded; dropped afterwards"""
+    name = f"tru_stride_test_{uuid.uuid4().hex[:12]}"
+    with psycopg.connect(DATABASE_URL, autocommit=True) as admin:
+        admin.execute(f'CREATE DATABASE "{name}"')
+        trigram_search = admin.execute(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'").fetchone() is not None
+    try:
+        url = make_conninfo(DATABASE_URL, dbname=name)
+        with psycopg.connect(url, autocommit=True) as connection:
+            connection.execute("SET TIME ZONE 'UTC'")
+            connection.execute(SUPABASE_AUTH_SQL)
+            connection.execute(setup_sql(trigram_search))
+            yield connection
+    finally:
+        with psycopg.connect(DATABASE_URL, autocommit=True) as admin:
+            admin.execute(f'DROP DATABASE IF EXISTS "{name}"')
+
+@pytest.fixture(scope='module')
+def data(db):
+    """Random users and videos, inserted in bulk; returns (profiles, videos) as the database has them"""
+    rng = random.Random(9)
+    today = db.execute("SELECT CURRENT_DATE").fetchone()[0]
+    start = datetime.combine(today, datetime.min.time())
+
+    # Usernames with LIKE wildcards in them check that searches escape them
+    names = [f"{rng.choice(['rider', 'Trainer', 'vet', 'groom'])}{'_%'[i % 2] if i % 5 == 0 else ''}{i}"
+             for i in range(USERS)]
+    users = [(uuid.uuid4(), f"{name}@example.com", Jsonb({'username': name}))
+             for name in names]
+    with db.cursor() as cursor:
+        cursor.executemany("INSERT INTO auth.users (id, email, raw_user_meta_data) VALUES (%s, %s, %s)", users)
+        # A few users share a signup time, so paging has to break ties on id
+        cursor.executemany("UPDATE profiles SET created_at = %s, is_admin = %s WHERE id = %s",
+                           [(start - timedelta(days=rng.randrange(20)), rng.random() < 0.1, user_id)
+                            for user_id, _, _ in users])
+
+    user_ids = [user_id for user_id, _, _ in users[:-5]]  # The last users have no videos
+    insert_videos(db, rng, user_ids, start, VIDEOS)
+    return fetch_profiles(db), fetch_videos(db)
+
+def insert_videos(db, rng, user_ids, start, count):
+    """Insert count random videos with one statement, so the rollup trigger sees them as one batch"""
+    rows = [(rng.choice(user_ids), f"clip{i}.mp4",
+             start + timedelta(days=1) - timedelta(seconds=rng.randrange(1, DAYS * 86400)))
+            for i in range(count)]
+    db.execute("INSERT INTO videos (user_id, filename, upload_date) "
+               "SELECT * FROM unnest(%s::uuid[], %s::text[], %s::timestamp[])",
+               [list(column) for column in zip(*rows)])
+
+def fetch_profiles(db):
+    columns = ['id', 'username', 'is_admin', 'created_at']
+    return [dict(zip(columns, row)) for row in db.execute(f"SELECT {', '.join(columns)} FROM profiles")]
+
+def fetch_videos(db):
+    return [{'id': row[0], 'user_id': row[1], 'upload_date': row[2]}
+            for row in db.execute("SELECT id, user_id, upload_date FROM videos")]
+
+def recount_daily_uploads(videos):
+    return dict(Counter(video['upload_date'].date() for video in videos))
+
+def rollup(db):
+    """daily_upload_counts, without days taken back to 0"""
+    return {date: uploads for date, uploads in db.execute("SELECT date, uploads FROM daily_upload_counts")
+            if uploads}
+
+def test_dashboard_totals(db, data):
+    profiles, videos = data
+    assert db.execute("SELECT * FROM admin_dashboard_totals()").fetchone() == (len(profiles), len(videos))
+
+def test_videos_per_user(db, data):
+    profiles, videos = data
+    counts = Counter(video['user_id'] for video in videos)
+    expected = sorted(((profile['username'], counts[profile['id']], profile['is_admin']) for profile in profiles),
+                      key=lambda row: (-row[1], row[0]))
+    assert db.execute("SELECT * FROM admin_videos_per_user()").fetchall() == expected
+
+@pytest.mark.parametrize('days', [1, 7, 30, DAYS + 10])
+def test_daily_uploads(db, data, days):
+    _, videos = data
+    today = db.execute("SELECT CURRENT_DATE").fetchone()[0]
+    counts = recount_daily_uploads(videos)
+    expected = [(today - timedelta(days=offset), counts.get(today - timedelta(days=offset), 0))
+                for offset in reversed(range(days))]
+    assert db.execute("SELECT * FROM admin_daily_uploads(%s)", [days]).fetchall() == expected
+
+@pytest.mark.parametrize('search', [None, 'rider', 'TRAINER', '_', '%', 'nobody'])
+@pytest.mark.parametrize('page_size', [7, 25])
+def test_users_page(db, data, search, page_size):
+    profiles, videos = data
+    pattern = _like_pattern(search) if search else None
+    counts = Counter(video['user_id'] for video in videos)
+    matching = [profile for profile in profiles
+                if search is None or search.lower() in profile['username'].lower()]
+    expected = [(profile['id'], profile['username'], profile['created_at'], profile['is_admin'],
+                 counts[profile['id']])
+                for profile in sorted(matching, key=lambda profile: (profile['created_at'], profile['id']),
+                                      reverse=True)]
+
+    # Page through the way the app does, one extra row meaning there is a next page
+    listed, after = [], (None, None)
+    while True:
+        rows = db.execute("SELECT * FROM admin_users_page(%s, %s, %s, %s)",
+                          [pattern, page_size, *after]).fetchall()
+        listed += rows[:page_size]
+        if len(rows) <= page_size:
+            break
+        after = (rows[page_size - 1][2], rows[page_size - 1][0])
+    assert listed == expected
+
+    assert db.execute("SELECT * FROM admin_user_counts(%s)", [pattern]).fetchone() == (
+        len(matching), sum(profile['is_admin'] for profile in profiles), len(profiles))
+
+# Tests that write roll back, so every test sees the same data
+
+def test_set_admin_status(db, data):
+    profiles, _ = data
+    promote = [profile['id'] for profile in profiles[:4]]
+    demote = [profile['id'] for profile in profiles[4:8]]
+    untouched = {profile['id']: profile['is_admin'] for profile in profiles[8:]}
+    with db.transaction(force_rollback=True):
+        db.execute("SELECT admin_set_admin_status(%s, %s)", [promote, demote])
+        is_admin = {profile['id']: profile['is_admin'] for profile in fetch_profiles(db)}
+    assert all(is_admin[user_id] for user_id in promote)
+    assert not any(is_admin[user_id] for user_id in demote)
+    assert {user_id: is_admin[user_id] for user_id in untouched} == untouched
+
+def test_rollup_follows_bulk_inserts_and_deletes(db, data):
+    profiles, videos = data
+    assert rollup(db) == recount_daily_uploads(videos)
+
+    rng = random.Random(3)
+    with db.transaction(force_rollback=True):
+        # A bulk delete spanning many days
+        deleted = rng.sample([video['id'] for video in videos], len(videos) // 4)
+        db.execute("DELETE FROM videos WHERE id = ANY(%s)", [deleted])
+        assert rollup(db) == recount_daily_uploads(fetch_videos(db))
+
+        # Deleting a user cascades to their videos
+        db.execute("DELETE FROM auth.users WHERE id = %s", [profiles[0]['id']])
+        assert rollup(db) == recount_daily_uploads(fetch_videos(db))
+
+        # Another bulk insert, onto days that already have rows
+        start = datetime.combine(db.execute("SELECT CURRENT_DATE").fetchone()[0], datetime.min.time())
+        insert_videos(db, rng, [profile['id'] for profile in profiles[1:]], start, 500)
+        assert rollup(db) == recount_daily_uploads(fetch_videos(db))